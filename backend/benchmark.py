@@ -0,0 +1,773 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Benchmarks
+Measures query and scoring strategies against the local database.
+
+All synthetic data is written inside a transaction that is rolled back,
+so the benchmarks never leave rows behind (`batch`, which goes through a
+running server, deletes its rooms afterwards).
+
+Run: python benchmark.py recommend --rooms 10,100,1000,5000
+     python benchmark.py facilities --rooms 1000,10000,50000
+     python benchmark.py scoring --rooms 100,1000,10000
+     python benchmark.py load --clients 1000 --duration 20 /api/sensors/1/latest
+     python benchmark.py ingest --readings 1000,10000,100000
+     python benchmark.py serial --devices 1,10,50 --lines 20000
+     python benchmark.py recent --hours 1,6,24
+     python benchmark.py serialize --rows 100,1000
+     python benchmark.py roomcheck --limit 10,100,1000
+     python benchmark.py batch --batch-size 1000,10000,100000 --clients 4
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import pty
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import numpy as np
+
+import decision
+import ingest
+import recent
+import serial_ingest
+from catalog import FacilityIndex, ROOM_COLUMNS
+from history import series_query
+from simulator import DB_CONFIG, generate_room_data
+
+
+def timed(fn, repeat: int) -> dict:
+    """Run fn `repeat` times and return latency figures in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def create_synthetic_rooms(cur, count: int, readings_per_room: int = 0) -> list[int]:
+    """Insert `count` rooms with a short reading history each; returns room ids."""
+    rows = execute_values(
+        cur,
+        """
+        INSERT INTO rooms (name, building, floor, capacity,
+                           has_projector, has_whiteboard, has_power_outlets, is_accessible)
+        VALUES %s
+        RETURNING id
+        """,
+        [
+            (f"Bench {i:05d}", f"Bench {i % 20}", i % 6, 10 + i % 90,
+             i % 2 == 0, i % 3 != 0, i % 30, i % 4 != 0)
+            for i in range(count)
+        ],
+        fetch=True,
+        page_size=1000,
+    )
+    room_ids = [row[0] for row in rows]
+
+    now = datetime.now()
+    values = []
+    for room_id in room_ids:
+        previous = None
+        for step in range(readings_per_room):
+            previous = generate_room_data(room_id, previous)
+            values.append((
+                room_id, now - timedelta(seconds=3 * (readings_per_room - step)),
+                previous["temperature"], previous["co2"], previous["humidity"], previous["sound"],
+            ))
+    if values:
+        execute_values(
+            cur,
+            "INSERT INTO sensor_data (room_id, timestamp, temperature, co2, humidity, sound) VALUES %s",
+            values,
+            page_size=5000,
+        )
+    cur.execute("ANALYZE rooms")
+    cur.execute("ANALYZE sensor_data")
+    return room_ids
+
+
+# ============================================================
+# /api/recommend: per-room lookups vs. one LATERAL join
+# ============================================================
+
+RECOMMEND_ROOMS_QUERY = """
+    SELECT id, name, building, floor, capacity,
+           has_projector, has_whiteboard, has_power_outlets, is_accessible
+    FROM rooms
+    WHERE capacity >= %s
+    ORDER BY name
+"""
+
+RECOMMEND_PER_ROOM_QUERY = """
+    SELECT temperature, co2, humidity, sound
+    FROM sensor_data
+    WHERE room_id = %s
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+
+RECOMMEND_LATERAL_QUERY = """
+    SELECT r.id, r.name, r.building, r.floor, r.capacity,
+           r.has_projector, r.has_whiteboard, r.has_power_outlets, r.is_accessible,
+           s.temperature, s.co2, s.humidity, s.sound
+    FROM rooms r
+    LEFT JOIN LATERAL (
+        SELECT temperature, co2, humidity, sound
+        FROM sensor_data
+        WHERE room_id = r.id
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE r.capacity >= %s
+    ORDER BY r.name
+"""
+
+
+def bench_recommend(room_counts: list[int], readings_per_room: int, repeat: int):
+    """Compare the old N+1 recommend fetch with the single LATERAL query."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"{'rooms':>7} {'N+1 median':>12} {'N+1 p95':>10} {'lateral median':>15} {'lateral p95':>12} {'speedup':>8}")
+    try:
+        for count in room_counts:
+            with conn.cursor() as cur:
+                create_synthetic_rooms(cur, count, readings_per_room)
+
+                def per_room():
+                    cur.execute(RECOMMEND_ROOMS_QUERY, (1,))
+                    for room in cur.fetchall():
+                        cur.execute(RECOMMEND_PER_ROOM_QUERY, (room[0],))
+                        cur.fetchone()
+
+                def lateral():
+                    cur.execute(RECOMMEND_LATERAL_QUERY, (1,))
+                    cur.fetchall()
+
+                old = timed(per_room, repeat)
+                new = timed(lateral, repeat)
+            conn.rollback()
+
+            print(f"{count:>7} {old['median']:>10.2f}ms {old['p95']:>8.2f}ms "
+                  f"{new['median']:>13.2f}ms {new['p95']:>10.2f}ms {old['median'] / new['median']:>7.1f}x")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ============================================================
+# Facility filtering: SQL WHERE clause vs. FacilityIndex bitmaps
+# ============================================================
+
+FACILITY_SQL_QUERY = f"""
+    SELECT {ROOM_COLUMNS}
+    FROM rooms
+    WHERE 1=1 AND capacity >= %s AND has_projector = TRUE AND is_accessible = TRUE
+      AND has_power_outlets >= %s
+    ORDER BY name
+"""
+
+
+def bench_facilities(room_counts: list[int], repeat: int):
+    """Compare the SQL facility filter with the in-memory bitmap index."""
+    from psycopg2.extras import RealDictCursor
+
+    requirements = {"min_capacity": 40, "needs_projector": True, "needs_accessible": True,
+                    "min_power_outlets": 10}
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"{'rooms':>7} {'matches':>8} {'SQL median':>11} {'index build':>12} "
+          f"{'candidates':>11} {'+ select':>10}")
+    try:
+        for count in room_counts:
+            with conn.cursor() as cur:
+                create_synthetic_rooms(cur, count)
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"SELECT {ROOM_COLUMNS} FROM rooms ORDER BY name")
+                rooms = cur.fetchall()
+
+                def sql():
+                    cur.execute(FACILITY_SQL_QUERY, (requirements["min_capacity"],
+                                                     requirements["min_power_outlets"]))
+                    return cur.fetchall()
+
+                matches = len(sql())
+                sql_time = timed(sql, repeat)
+
+            conn.rollback()
+
+            started = time.perf_counter()
+            index = FacilityIndex(rooms)
+            build_ms = (time.perf_counter() - started) * 1000
+            assert len(index.select(index.candidates(**requirements))) == matches
+
+            # The bitmap resolution alone is far below timer resolution per call
+            inner = 1000
+            candidates = timed(lambda: [index.candidates(**requirements) for _ in range(inner)], repeat)
+            selected = timed(lambda: index.select(index.candidates(**requirements)), repeat)
+
+            print(f"{count:>7} {matches:>8} {sql_time['median']:>9.2f}ms {build_ms:>10.1f}ms "
+                  f"{candidates['median'] * 1000 / inner:>9.1f}us {selected['median']:>8.2f}ms")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ============================================================
+# Scoring: scalar functions vs. array curves vs. lookup tables
+# ============================================================
+
+def bench_scoring(room_counts: list[int], repeat: int):
+    """Compare per-reading scoring with the vectorized and table-driven paths."""
+    rng = random.Random(0)
+    profile = decision.DesiredProfile(temperature=21.5, co2=550, humidity=45.0, sound=32.0)
+
+    # Table build cost, paid once per distinct ideal
+    decision.score_table.cache_clear()
+    started = time.perf_counter()
+    for criterion in decision.ARRAY_SCORERS:
+        decision.score_table(criterion, getattr(profile, criterion))
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"Tables for one custom profile built in {build_ms:.2f}ms")
+
+    print(f"{'rooms':>7} {'scalar':>10} {'arrays':>10} {'tables':>10} {'speedup':>8}")
+    for count in room_counts:
+        readings = [
+            decision.SensorReading(
+                temperature=rng.randint(150, 300) / 10, co2=rng.randint(400, 1600),
+                humidity=rng.randint(250, 750) / 10, sound=rng.randint(250, 600) / 10,
+            )
+            for _ in range(count)
+        ]
+        columns = {
+            criterion: np.array([getattr(reading, criterion) for reading in readings], dtype=np.float64)
+            for criterion in decision.ARRAY_SCORERS
+        }
+
+        scalar = timed(lambda: [decision.calculate_room_score(r, decision.Weights(), profile)
+                                for r in readings], repeat)
+        arrays = timed(lambda: decision.score_columns(columns, profile, lookup=False), repeat)
+        tables = timed(lambda: decision.score_columns(columns, profile, lookup=True), repeat)
+
+        print(f"{count:>7} {scalar['median']:>8.2f}ms {arrays['median']:>8.3f}ms "
+              f"{tables['median']:>8.3f}ms {scalar['median'] / tables['median']:>7.0f}x")
+
+
+# ============================================================
+# Bulk ingest: validation/encoding cost and COPY vs. INSERT
+# ============================================================
+
+def bench_ingest(reading_counts: list[int], repeat: int):
+    """Readings per second for each step of POST /api/sensors/batch."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM rooms")
+            room_ids = {row[0] for row in cur.fetchall()}
+        rooms = sorted(room_ids)
+        now = datetime.now()
+
+        print(f"{'readings':>9} {'validate':>12} {'encode':>12} {'COPY':>12} {'INSERT':>12}")
+        for count in reading_counts:
+            readings = []
+            previous = {}
+            for i in range(count):
+                room_id = rooms[i % len(rooms)]
+                previous[room_id] = generate_room_data(room_id, previous.get(room_id))
+                readings.append({**previous[room_id], "timestamp": now - timedelta(milliseconds=count - i)})
+            rows, _ = ingest.validate(readings, room_ids)
+            data = ingest.encode_copy(rows)
+
+            def copy():
+                with conn.cursor() as cur:
+                    cur.copy_expert(ingest.COPY_SQL, io.BytesIO(data))
+                conn.rollback()
+
+            def insert():
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        "INSERT INTO sensor_data (room_id, timestamp, temperature, co2, humidity, sound) VALUES %s",
+                        rows,
+                        page_size=5000,
+                    )
+                conn.rollback()
+
+            rates = [
+                count / (timed(fn, repeat)["median"] / 1000)
+                for fn in (lambda: ingest.validate(readings, room_ids), lambda: ingest.encode_copy(rows),
+                           copy, insert)
+            ]
+            print(f"{count:>9} " + " ".join(f"{rate:>10.0f}/s" for rate in rates))
+    finally:
+        conn.close()
+
+
+# ============================================================
+# Serial ingest: Arduino lines over pseudo-terminals
+# ============================================================
+
+async def run_serial(device_count: int, lines_per_device: int, batch_size: int, write) -> dict:
+    """Feed `lines_per_device` Arduino lines into each of `device_count` ptys and ingest them."""
+    ptys = [pty.openpty() for _ in range(device_count)]
+    payloads = []
+    for master, _ in ptys:
+        previous = None
+        lines = []
+        for _ in range(lines_per_device):
+            previous = generate_room_data(0, previous)
+            lines.append(json.dumps({"temp": previous["temperature"], "co2": previous["co2"],
+                                     "humidity": previous["humidity"], "sound": previous["sound"]}))
+        payloads.append(("\n".join(lines) + "\n").encode())
+
+    def feed(master: int, payload: bytes):
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(master, view):]
+
+    room_ids = write.room_ids
+    reader = serial_ingest.SerialIngest(
+        {os.ttyname(slave): room_ids[i % len(room_ids)] for i, (_, slave) in enumerate(ptys)},
+        write, batch_size=batch_size,
+    )
+    try:
+        # Devices are switched to raw mode (no echo) before anything is written
+        await reader.start()
+        started = time.perf_counter()
+        feeders = [threading.Thread(target=feed, args=(master, payload), daemon=True)
+                   for (master, _), payload in zip(ptys, payloads)]
+        for feeder in feeders:
+            feeder.start()
+        total = device_count * lines_per_device
+        while reader.lines < total:
+            await asyncio.sleep(0.005)
+        parsed = time.perf_counter() - started
+        await reader.stop()
+        persisted = time.perf_counter() - started
+    finally:
+        for master, slave in ptys:
+            os.close(master)
+            os.close(slave)
+    stats = reader.stats()
+    return {
+        "parsed_rate": stats["lines"] / parsed,
+        "written_rate": stats["written"] / persisted,
+        "malformed": stats["malformed"],
+        "dropped": stats["dropped"],
+    }
+
+
+class BenchWriter:
+    """SerialIngest write callback that COPYs into an open transaction (or only counts)."""
+
+    def __init__(self, conn, room_ids: list[int], persist: bool):
+        self.conn = conn
+        self.room_ids = room_ids
+        self.persist = persist
+
+    async def __call__(self, readings: list[dict]) -> int:
+        if not self.persist:
+            return len(readings)
+        return await asyncio.to_thread(self._write, readings)
+
+    def _write(self, readings: list[dict]) -> int:
+        rows, _ = ingest.validate(readings, set(self.room_ids))
+        serial_ingest.copy_rows(self.conn, rows)
+        return len(rows)
+
+
+def bench_serial(device_counts: list[int], lines_per_device: int, batch_size: int):
+    """Lines per second parsed from ptys, and parsed + written to sensor_data."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"{'devices':>8} {'lines':>9} {'parsed':>12} {'persisted':>12} {'dropped':>8}")
+    try:
+        with conn.cursor() as cur:
+            room_ids = create_synthetic_rooms(cur, max(device_counts))
+        for count in device_counts:
+            parse_only = asyncio.run(run_serial(count, lines_per_device, batch_size,
+                                                BenchWriter(conn, room_ids, persist=False)))
+            persisted = asyncio.run(run_serial(count, lines_per_device, batch_size,
+                                               BenchWriter(conn, room_ids, persist=True)))
+            print(f"{count:>8} {count * lines_per_device:>9} {parse_only['parsed_rate']:>10.0f}/s "
+                  f"{persisted['written_rate']:>10.0f}/s {persisted['dropped']:>8}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ============================================================
+# Recent history: in-memory arrays vs. sensor_data
+# ============================================================
+
+def verify_recent_overlap(room_id: int, rows: list[dict]):
+    """
+    A load that read rows the feed delivers afterwards (in order, or late
+    after filling a hole) must still hold each reading once.
+    """
+    rows = sorted(rows, key=lambda row: (row["timestamp"], row["id"]))
+    since = datetime.now() - timedelta(days=2)
+    history = recent.RecentHistory(None, horizon=timedelta(days=2))
+    history.update(rows[-10:-5])  # delivered before the load
+    history.load(room_id, rows, since)
+    history.update(rows[-5:])  # delivered after the load read them
+    history.update(rows[-200:-100:10])  # hole fills: older than the newest rows
+    ids = [row["id"] for row in history.lookup(room_id, since, None, len(rows) + 10)]
+    assert len(ids) == len(set(ids)) == len(rows), "recent history holds a reading twice"
+    assert ids == [row["id"] for row in reversed(rows)], "recent history is out of order"
+
+
+def bench_recent(hour_counts: list[int], limit: int, repeat: int):
+    """Memory per room per hour of RecentHistory, and its latency next to the raw query."""
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"{'hours':>6} {'readings':>9} {'bytes/reading':>14} {'KiB/hour':>9} "
+          f"{'SQL median':>11} {'memory median':>14} {'speedup':>8}")
+    try:
+        for hours in hour_counts:
+            # One reading every 3 seconds, as the simulator writes them
+            with conn.cursor() as cur:
+                room_id = create_synthetic_rooms(cur, 1, hours * 1200)[0]
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT id, room_id, timestamp, temperature, co2, humidity, sound
+                    FROM sensor_data WHERE room_id = %s
+                """, (room_id,))
+                rows = cur.fetchall()
+
+                history = recent.RecentHistory(None, horizon=timedelta(hours=hours + 1))
+                history.load(room_id, rows, datetime.now() - timedelta(hours=hours + 1))
+                stats = history.stats()
+                start = datetime.now() - timedelta(hours=1)
+                assert len(history.lookup(room_id, start, None, limit)) == min(limit, len(rows))
+                verify_recent_overlap(room_id, rows)
+
+                query, params = series_query(room_id, start, None, None, "avg", limit)
+                sql = timed(lambda: (cur.execute(query, params), cur.fetchall()), repeat)
+            memory = timed(lambda: history.lookup(room_id, start, None, limit), repeat)
+            conn.rollback()
+
+            print(f"{hours:>6} {stats['readings']:>9} {stats['bytes'] / stats['readings']:>14.1f} "
+                  f"{stats['bytes'] / hours / 1024:>9.1f} {sql['median']:>9.2f}ms "
+                  f"{memory['median']:>12.3f}ms {sql['median'] / memory['median']:>7.0f}x")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ============================================================
+# Serialization: response_model validation vs. orjson
+# ============================================================
+
+def bench_serialize(row_counts: list[int], repeat: int):
+    """Per-row cost of FastAPI's response_model path and of the FastJSONResponse path."""
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    import fastjson
+    from main import RoomScore, SensorData
+
+    sensor_model = TypeAdapter(list[SensorData])
+    score_model = TypeAdapter(list[RoomScore])
+
+    def response_model_path(model, rows):
+        # What FastAPI does for a declared response_model: validate, dump, json.dumps
+        return JSONResponse(model.dump_python(model.validate_python(rows), mode="json")).body
+
+    print(f"{'payload':>10} {'rows':>6} {'response_model':>15} {'orjson':>10} {'speedup':>8}")
+    now = datetime.now()
+    for count in row_counts:
+        # Rows as the database returns them (NUMERIC loaded as float, see db.py)
+        sensor_rows = []
+        previous = None
+        for i in range(count):
+            previous = generate_room_data(1, previous)
+            sensor_rows.append({
+                "id": i + 1, "room_id": 1, "timestamp": now - timedelta(seconds=3 * i),
+                "temperature": previous["temperature"], "co2": previous["co2"],
+                "humidity": previous["humidity"], "sound": previous["sound"],
+            })
+
+        columns = {c: np.array([float(row[c]) for row in sensor_rows]) for c in decision.CRITERIA}
+        ranked = decision.rank_rooms_arrays(
+            list(range(count)), [f"Room {i}" for i in range(count)], columns, decision.Weights(),
+        )
+        for room in ranked:
+            room["facilities"] = {"capacity": 30, "has_projector": True, "has_whiteboard": False,
+                                  "has_power_outlets": 10, "is_accessible": True}
+
+        for name, model, rows in (("sensors", sensor_model, sensor_rows), ("recommend", score_model, ranked)):
+            assert json.loads(response_model_path(model, rows)) == json.loads(fastjson.dumps(rows))
+            old = timed(lambda: response_model_path(model, rows), repeat)
+            new = timed(lambda: fastjson.FastJSONResponse(rows).body, repeat)
+            print(f"{name:>10} {count:>6} {old['median'] * 1000 / count:>12.2f}us "
+                  f"{new['median'] * 1000 / count:>7.2f}us {old['median'] / new['median']:>7.0f}x")
+
+
+# ============================================================
+# Room existence: separate SELECT vs. room catalog lookup
+# ============================================================
+
+CALENDAR_QUERY = """
+    SELECT id, room_id, title, start_time, end_time, organizer
+    FROM calendar_events
+    WHERE room_id = %s AND start_time >= CURRENT_DATE
+    ORDER BY start_time ASC, id ASC
+    LIMIT %s
+"""
+
+
+def bench_roomcheck(limits: list[int], repeat: int):
+    """Sensor/calendar request latency with the old `SELECT id FROM rooms` check vs. a catalog lookup."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"{'payload':>9} {'limit':>6} {'SELECT+query':>13} {'catalog+query':>14} {'saved':>8}")
+    try:
+        with conn.cursor() as cur:
+            room_id = create_synthetic_rooms(cur, 1, max(limits))[0]
+            cur.execute("SELECT id FROM rooms")
+            catalog = {row[0]: row for row in cur.fetchall()}
+            start = datetime.now() - timedelta(days=1)
+
+            for limit in limits:
+                sensor_query = series_query(room_id, start, None, None, "avg", limit)
+                for name, (query, params) in (("sensors", sensor_query),
+                                              ("calendar", (CALENDAR_QUERY, (room_id, limit)))):
+
+                    def select_check():
+                        # What the endpoints did: one round trip for the check, one for the data
+                        cur.execute("SELECT id FROM rooms WHERE id = %s", (room_id,))
+                        assert cur.fetchone()
+                        cur.execute(query, params)
+                        cur.fetchall()
+
+                    def catalog_check():
+                        assert room_id in catalog
+                        cur.execute(query, params)
+                        cur.fetchall()
+
+                    # Alternate the two so drift (caching, other load) hits both alike
+                    old, new = [], []
+                    for _ in range(repeat):
+                        old.append(timed(select_check, 1)["median"])
+                        new.append(timed(catalog_check, 1)["median"])
+                    old, new = statistics.median(old), statistics.median(new)
+                    print(f"{name:>9} {limit:>6} {old:>11.3f}ms {new:>12.3f}ms {old - new:>6.3f}ms")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ============================================================
+# HTTP load: concurrent clients against a running API server
+# ============================================================
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+async def run_load(base_url: str, path: str, clients: int, duration: float, body: str = None) -> dict:
+    """
+    Keep `clients` keep-alive connections busy for `duration` seconds.
+
+    Uses raw asyncio streams instead of an HTTP client library so the load
+    generator itself stays cheap next to the server under test.
+    """
+    from urllib.parse import urlsplit
+
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    if body is None:
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    else:
+        payload = body.encode()
+        request = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(payload)}\r\n\r\n").encode() + payload
+
+    latencies = []
+    errors = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = int(head.split(b" ", 2)[1])
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                status = type(e).__name__
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+def bench_load(base_url: str, path: str, clients: int, duration: float, body: str = None):
+    """Print throughput and latency percentiles for one endpoint under load."""
+    result = asyncio.run(run_load(base_url, path, clients, duration, body))
+    print(f"{path} with {clients} concurrent clients for {duration:.0f}s")
+    print(f"  {result['requests']} ok, {result['rps']:.0f} req/s, "
+          f"p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms p99={result['p99']:.1f}ms")
+    if result["errors"]:
+        print(f"  errors: {result['errors']}")
+
+
+def bench_batch(base_url: str, batch_sizes: list[int], rooms: int, clients: int, duration: float):
+    """
+    End-to-end readings/s of POST /api/sensors/batch against a running server.
+
+    Unlike the other benchmarks this one commits: it writes to synthetic
+    rooms created for the run and deletes them (with their readings and
+    rollups) afterwards.
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    room_ids = []
+    try:
+        with conn.cursor() as cur:
+            room_ids = create_synthetic_rooms(cur, rooms)
+        conn.commit()
+        # Let the server's room catalog pick up the new rooms
+        time.sleep(1)
+
+        print(f"{'batch':>7} {'clients':>8} {'readings/s':>11} {'p50':>9} {'p99':>9}  errors")
+        for size in batch_sizes:
+            now = datetime.now()
+            readings = []
+            previous = {}
+            for i in range(size):
+                room_id = room_ids[i % len(room_ids)]
+                previous[room_id] = generate_room_data(room_id, previous.get(room_id))
+                readings.append({**previous[room_id], "timestamp": (now - timedelta(milliseconds=size - i)).isoformat()})
+            body = json.dumps({"readings": readings})
+
+            result = asyncio.run(run_load(base_url, "/api/sensors/batch", clients, duration, body))
+            print(f"{size:>7} {clients:>8} {result['rps'] * size:>11.0f} {result['p50']:>7.1f}ms "
+                  f"{result['p99']:>7.1f}ms  {result['errors'] or ''}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM rooms WHERE id = ANY(%s)", (room_ids,))
+        conn.commit()
+        conn.close()
+
+
+def parse_counts(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("recommend", help="recommend fetch latency vs. room count")
+    p.add_argument("--rooms", type=parse_counts, default=[10, 100, 1000, 5000])
+    p.add_argument("--readings", type=int, default=20, help="readings per synthetic room")
+    p.add_argument("--repeat", type=int, default=10)
+
+    p = sub.add_parser("facilities", help="facility filter: SQL vs. bitmap index")
+    p.add_argument("--rooms", type=parse_counts, default=[1000, 10000, 50000])
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("scoring", help="criterion scoring: scalar vs. arrays vs. lookup tables")
+    p.add_argument("--rooms", type=parse_counts, default=[100, 1000, 10000, 100000])
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("load", help="HTTP load against a running API server")
+    p.add_argument("path", nargs="?", default="/api/sensors/1/latest")
+    p.add_argument("--url", default="http://localhost:8000")
+    p.add_argument("--clients", type=int, default=1000)
+    p.add_argument("--duration", type=float, default=20)
+    p.add_argument("--body", default=None, help="JSON body; sends POST instead of GET")
+
+    p = sub.add_parser("ingest", help="bulk ingest: validation, COPY encoding, COPY vs. INSERT")
+    p.add_argument("--readings", type=parse_counts, default=[1000, 10000, 100000])
+    p.add_argument("--repeat", type=int, default=5)
+
+    p = sub.add_parser("serial", help="serial ingest: lines/s parsed and persisted from ptys")
+    p.add_argument("--devices", type=parse_counts, default=[1, 10, 50])
+    p.add_argument("--lines", type=int, default=20000, help="lines per device")
+    p.add_argument("--batch-size", type=int, default=serial_ingest.BATCH_SIZE)
+
+    p = sub.add_parser("recent", help="recent history arrays: memory per room-hour, latency vs. SQL")
+    p.add_argument("--hours", type=parse_counts, default=[1, 6, 24])
+    p.add_argument("--limit", type=int, default=1000)
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("serialize", help="response encoding: response_model validation vs. orjson, per row")
+    p.add_argument("--rows", type=parse_counts, default=[100, 1000])
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("roomcheck", help="sensor/calendar latency: separate room SELECT vs. catalog lookup")
+    p.add_argument("--limit", type=parse_counts, default=[10, 100, 1000])
+    p.add_argument("--repeat", type=int, default=50)
+
+    p = sub.add_parser("batch", help="POST /api/sensors/batch end to end against a running API server")
+    p.add_argument("--url", default="http://localhost:8000")
+    p.add_argument("--batch-size", type=parse_counts, default=[1000, 10000, 100000])
+    p.add_argument("--rooms", type=int, default=200, help="synthetic rooms the readings are spread over")
+    p.add_argument("--clients", type=int, default=4)
+    p.add_argument("--duration", type=float, default=20)
+
+    args = parser.parse_args()
+
+    if args.benchmark == "recommend":
+        bench_recommend(args.rooms, args.readings, args.repeat)
+    elif args.benchmark == "facilities":
+        bench_facilities(args.rooms, args.repeat)
+    elif args.benchmark == "scoring":
+        bench_scoring(args.rooms, args.repeat)
+    elif args.benchmark == "load":
+        bench_load(args.url, args.path, args.clients, args.duration, args.body)
+    elif args.benchmark == "ingest":
+        bench_ingest(args.readings, args.repeat)
+    elif args.benchmark == "serial":
+        bench_serial(args.devices, args.lines, args.batch_size)
+    elif args.benchmark == "recent":
+        bench_recent(args.hours, args.limit, args.repeat)
+    elif args.benchmark == "serialize":
+        bench_serialize(args.rows, args.repeat)
+    elif args.benchmark == "roomcheck":
+        bench_roomcheck(args.limit, args.repeat)
+    elif args.benchmark == "batch":
+        bench_batch(args.url, args.batch_size, args.rooms, args.clients, args.duration)
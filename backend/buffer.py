@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Gateway Buffer
+Store-and-forward of sensor readings on the Raspberry Pi.
+
+Readings are appended to a local SQLite database in WAL mode first, which
+is cheap and never waits on the central database, and survives restarts.
+A forwarder drains the buffer oldest-first in large batches (the write
+callback COPYs them, see serial_ingest.DatabaseWriter) and deletes each
+batch once it is stored. While the database is unreachable readings simply
+accumulate; failed attempts back off exponentially with jitter, and replay
+after an outage is capped at `max_rate` readings/s so a whole fleet of
+gateways reconnecting at once does not stampede the database.
+
+Delivery is at least once. A batch is deleted only after its COPY has
+committed, so a crash between the commit and the delete, or a connection
+lost before the commit was confirmed, sends the same batch again and
+stores its readings twice, in sensor_data and in the rollups. At most one
+batch (`FORWARD_BATCH` readings) is repeated per such failure. Duplicates
+have the same room_id and timestamp.
+
+Run: python buffer.py stats /var/lib/comfortroom/buffer.db
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+FORWARD_BATCH = 5000          # readings per forwarded batch
+CATCH_UP_RATE = 20000         # readings/s while replaying a backlog
+MAX_DEPTH = 5_000_000         # oldest readings are discarded beyond this
+RETRY_MIN_DELAY = 1.0         # seconds; doubles per failed attempt ...
+RETRY_MAX_DELAY = 60.0        # ... up to this, +-50% jitter
+IDLE_POLL = 1.0               # seconds between checks of an empty buffer
+
+COLUMNS = ("room_id", "timestamp", "temperature", "co2", "humidity", "sound")
+
+
+class ReadingBuffer:
+    """
+    Append-only queue of readings in a SQLite file.
+
+    Rows are numbered in append order and only ever deleted from the head,
+    so depth is the span of row ids. `append` can be used directly as a
+    SerialIngest write callback.
+    """
+
+    def __init__(self, path: str, max_depth: int = MAX_DEPTH):
+        self.path = path
+        self.max_depth = max_depth
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Committed appends survive a crash of this process; a power cut can
+        # lose the last moments, which a gateway would lose anyway
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS readings (
+                seq INTEGER PRIMARY KEY,
+                room_id INTEGER,
+                timestamp TEXT,
+                temperature REAL,
+                co2 REAL,
+                humidity REAL,
+                sound REAL
+            )
+        """)
+        self.conn.commit()
+        self.appended_event = asyncio.Event()
+
+        # Counters for stats()
+        self.appended = 0
+        self.discarded = 0
+
+    async def __call__(self, readings: list[dict]) -> int:
+        self.append(readings)
+        return len(readings)
+
+    def append(self, readings: list[dict]):
+        """Durably add readings (dicts with room_id, timestamp and sensor columns)."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO readings (room_id, timestamp, temperature, co2, humidity, sound) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (r.get("room_id"), r["timestamp"].isoformat() if r.get("timestamp") else None,
+                     r.get("temperature"), r.get("co2"), r.get("humidity"), r.get("sound"))
+                    for r in readings
+                ],
+            )
+            excess = self.depth() - self.max_depth
+            if excess > 0:
+                self.conn.execute("DELETE FROM readings WHERE seq < (SELECT MIN(seq) FROM readings) + ?",
+                                  (excess,))
+                self.discarded += excess
+        self.appended += len(readings)
+        self.appended_event.set()
+
+    def peek(self, limit: int) -> tuple[Optional[int], list[dict]]:
+        """Oldest `limit` readings and the seq to pass to `ack` once they are stored."""
+        rows = self.conn.execute(
+            "SELECT seq, room_id, timestamp, temperature, co2, humidity, sound "
+            "FROM readings ORDER BY seq LIMIT ?",
+            (limit,),
+        ).fetchall()
+        readings = []
+        for row in rows:
+            reading = {column: value for column, value in zip(COLUMNS, row[1:]) if value is not None}
+            if "timestamp" in reading:
+                reading["timestamp"] = datetime.fromisoformat(reading["timestamp"])
+            readings.append(reading)
+        return (rows[-1][0] if rows else None), readings
+
+    def ack(self, seq: int):
+        """Delete every reading up to and including `seq`."""
+        with self.conn:
+            self.conn.execute("DELETE FROM readings WHERE seq <= ?", (seq,))
+
+    def depth(self) -> int:
+        first, last = self.conn.execute("SELECT MIN(seq), MAX(seq) FROM readings").fetchone()
+        return last - first + 1 if first is not None else 0
+
+    def oldest(self) -> Optional[datetime]:
+        row = self.conn.execute("SELECT timestamp FROM readings ORDER BY seq LIMIT 1").fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def close(self):
+        self.conn.close()
+
+    def stats(self) -> dict:
+        oldest = self.oldest()
+        return {
+            "depth": self.depth(),
+            "oldest_age_s": round((datetime.now() - oldest).total_seconds(), 1) if oldest else None,
+            "file_bytes": sum(os.path.getsize(self.path + suffix)
+                              for suffix in ("", "-wal") if os.path.exists(self.path + suffix)),
+            "appended": self.appended,
+            "discarded": self.discarded,
+        }
+
+
+class Forwarder:
+    """
+    Background task moving buffered readings to the database via `write`.
+
+    `write` has the SerialIngest contract: awaited with a list of readings,
+    returns how many were stored (the rest were rejected), raises if the
+    batch could not be written, in which case it stays buffered. A batch
+    that was stored but not yet acked when the process stops is written
+    again after the restart (see the module docstring).
+    """
+
+    def __init__(
+        self,
+        buffer: ReadingBuffer,
+        write: Callable[[list[dict]], Awaitable[int]],
+        batch_size: int = FORWARD_BATCH,
+        max_rate: float = CATCH_UP_RATE,
+        retry_min_delay: float = RETRY_MIN_DELAY,
+        retry_max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.buffer = buffer
+        self.write = write
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.retry_min_delay = retry_min_delay
+        self.retry_max_delay = retry_max_delay
+        self._task = None
+        self._failures = 0
+
+        # Counters for stats()
+        self.batches = 0
+        self.forwarded = 0
+        self.rejected = 0
+        self.errors = 0
+        self.connected = False
+        self.replay_rate = 0.0
+        self.last_forward_at = None
+
+    def start(self):
+        """Start forwarding (must be called on the event loop)."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            seq, readings = self.buffer.peek(self.batch_size)
+            if not readings:
+                self.buffer.appended_event.clear()
+                try:
+                    await asyncio.wait_for(self.buffer.appended_event.wait(), IDLE_POLL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            started = time.perf_counter()
+            try:
+                written = await self.write(readings)
+            except Exception as e:
+                self.errors += 1
+                self.connected = False
+                delay = min(self.retry_max_delay, self.retry_min_delay * 2 ** self._failures)
+                delay *= random.uniform(0.5, 1.5)
+                self._failures += 1
+                print(f"Buffer forward failed ({self.buffer.depth()} readings buffered): {e}; "
+                      f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.buffer.ack(seq)
+            self._failures = 0
+            self.connected = True
+            self.batches += 1
+            self.forwarded += written
+            self.rejected += len(readings) - written
+            self.last_forward_at = time.time()
+
+            # Catch-up pacing: a batch may not take less than its share of max_rate
+            elapsed = time.perf_counter() - started
+            pause = len(readings) / self.max_rate - elapsed
+            if pause > 0:
+                await asyncio.sleep(pause)
+            self.replay_rate = len(readings) / (time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "batches": self.batches,
+            "forwarded": self.forwarded,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "replay_rate": round(self.replay_rate, 1),
+            "last_forward_at": self.last_forward_at,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom gateway buffer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", help="depth and age of a buffer file")
+    p.add_argument("path")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist")
+    buffer = ReadingBuffer(args.path)
+    try:
+        stats = buffer.stats()
+        print(f"{stats['depth']} readings buffered, oldest {stats['oldest_age_s']}s old, "
+              f"{stats['file_bytes'] / 1e6:.1f} MB")
+    finally:
+        buffer.close()
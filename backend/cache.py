@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom In-Process Caches
+Keeps hot query results in memory so the API can skip database round trips.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class LatestReadingCache:
+    """
+    Newest sensor_data row per room.
+
+    Entries are written by the sensor feed as new readings arrive and by the
+    endpoints after a database fallback. An entry older than `max_age` seconds
+    counts as a miss, so rooms are re-read from the database if the feed stops
+    delivering. `None` is cached for rooms without any reading.
+    """
+
+    def __init__(self, max_age: float = 30.0):
+        self.max_age = max_age
+        self._entries: dict[int, tuple[Optional[dict], float]] = {}
+        self._lock = threading.Lock()
+
+        # Counters for stats()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def update(self, rows: list[dict]):
+        """Store rows that are newer than the cached reading of their room."""
+        now = time.monotonic()
+        with self._lock:
+            for row in rows:
+                room_id = row["room_id"]
+                current = self._entries.get(room_id)
+                if current and current[0] and current[0]["timestamp"] > row["timestamp"]:
+                    continue
+                self._entries[room_id] = (row, now)
+                self.updates += 1
+
+    def put(self, room_id: int, row: Optional[dict]) -> Optional[dict]:
+        """
+        Store a reading loaded from the database (None = room has no data)
+        and return the room's newest reading.
+
+        A newer row the feed stored while the query ran is kept.
+        """
+        with self._lock:
+            current = self._entries.get(room_id)
+            if current and current[0] and (row is None or (
+                    (current[0]["timestamp"], current[0]["id"]) > (row["timestamp"], row["id"]))):
+                return current[0]
+            self._entries[room_id] = (row, time.monotonic())
+            return row
+
+    def get(self, room_id: int) -> tuple[bool, Optional[dict]]:
+        """Return (hit, row) for a room."""
+        found, _ = self.get_many([room_id])
+        if room_id in found:
+            return True, found[room_id]
+        return False, None
+
+    def get_many(self, room_ids: list[int]) -> tuple[dict[int, Optional[dict]], list[int]]:
+        """Return fresh cached rows by room id, plus the ids that missed."""
+        cutoff = time.monotonic() - self.max_age
+        found = {}
+        missing = []
+        for room_id in room_ids:
+            entry = self._entries.get(room_id)
+            if entry is not None and entry[1] >= cutoff:
+                found[room_id] = entry[0]
+            else:
+                missing.append(room_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def stats(self) -> dict:
+        return {
+            "max_age": self.max_age,
+            "rooms": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+        }
+
+
+class RecommendationCache:
+    """
+    Bounded LRU of /api/recommend results.
+
+    Keys are built by the caller from the normalized request. Every new batch
+    of sensor readings starts a new epoch and empties the cache, since any
+    score may have changed; results computed during an older epoch are not
+    stored. Entries also expire after `max_age` seconds in case the feed
+    stops delivering.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_age: float = 30.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.epoch = 0
+        self._entries: OrderedDict = OrderedDict()
+
+        # Counters for stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def new_epoch(self, *_):
+        """Start a new sensor epoch (usable directly as a feed subscriber)."""
+        self.epoch += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def get(self, key) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.max_age:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result: list, epoch: int):
+        """Store a result computed during `epoch`; dropped if the epoch moved on."""
+        if epoch != self.epoch or self.max_entries <= 0:
+            return
+        self._entries[key] = (result, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "max_entries": self.max_entries,
+            "entries": len(self._entries),
+            "epoch": self.epoch,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class DataVersions:
+    """
+    Change counters from the data_versions table, used as HTTP validators.
+
+    The counters are re-read (all in one query) after a data_versions
+    notification and otherwise every `check_interval` seconds, so a missed
+    notification only delays a change. Tables without a counter give None.
+    """
+
+    def __init__(self, db, check_interval: float = 60.0):
+        self.db = db
+        self.check_interval = check_interval
+        self._versions: dict[str, int] = {}
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+        # Counters for stats()
+        self.loads = 0
+        self.invalidations = 0
+
+    def invalidate(self, table: str = ""):
+        """Re-read the counters on next access (usable as a data_versions notify callback)."""
+        self._stale = True
+        self.invalidations += 1
+
+    async def get(self, table: str) -> Optional[int]:
+        if self._stale or time.monotonic() - self._checked_at >= self.check_interval:
+            async with self._lock:
+                if self._stale or time.monotonic() - self._checked_at >= self.check_interval:
+                    # Clear the flag first so an invalidation during the read sticks
+                    self._stale = False
+                    try:
+                        async with self.db.connection() as conn:
+                            cur = await conn.execute("SELECT name, version FROM data_versions")
+                            self._versions = {row["name"]: row["version"] for row in await cur.fetchall()}
+                    except BaseException:
+                        self._stale = True
+                        raise
+                    self._checked_at = time.monotonic()
+                    self.loads += 1
+        return self._versions.get(table)
+
+    def stats(self) -> dict:
+        return {
+            "versions": dict(self._versions),
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
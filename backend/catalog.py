@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Room Catalog
+In-memory copy of the rooms table, shared by the room and recommend endpoints.
+
+The rooms table changes rarely. The `rooms_version` trigger bumps the
+`rooms` counter in data_versions and sends a NOTIFY; the sensor feed passes
+that on to `invalidate()`. As a fallback the counter is compared every
+`check_interval` seconds, so a missed notification only delays a reload.
+
+Facility requirements are answered by a FacilityIndex rebuilt on every load.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Optional
+
+import numpy as np
+
+ROOM_COLUMNS = """
+    id, name, building, floor, capacity,
+    has_projector, has_whiteboard, has_power_outlets, is_accessible
+"""
+
+
+class FacilityIndex:
+    """
+    Bitmap index resolving facility requirements to candidate rooms.
+
+    Bit i of every bitmap stands for rooms[i] (name order); bitmaps are plain
+    Python ints, so combining requirements is a few big-int ANDs. Boolean
+    facilities get one bitmap each. Capacity and power outlets keep their
+    distinct values sorted, with one bitmap per value holding every room at
+    or above it, so a minimum resolves with one binary search.
+
+    Memory is one bit per room per boolean facility plus one bit per room per
+    distinct capacity/outlet value (e.g. 50k rooms x 300 distinct values ~ 2 MB).
+    """
+
+    def __init__(self, rooms: list[dict]):
+        self.rooms = rooms
+        self.all = (1 << len(rooms)) - 1
+        self.projector = self._bitmap(rooms, "has_projector")
+        self.whiteboard = self._bitmap(rooms, "has_whiteboard")
+        self.accessible = self._bitmap(rooms, "is_accessible")
+        self.capacity_values, self.capacity_masks = self._threshold_index(rooms, "capacity")
+        self.outlet_values, self.outlet_masks = self._threshold_index(rooms, "has_power_outlets")
+
+    @staticmethod
+    def _mask(positions: list[int], size: int) -> int:
+        # Building from a digit string is linear; OR-ing 1 << i per room
+        # would be quadratic for large catalogs.
+        if not size:
+            return 0
+        digits = bytearray(b"0") * size
+        for i in positions:
+            digits[size - 1 - i] = ord("1")
+        return int(digits, 2)
+
+    @classmethod
+    def _bitmap(cls, rooms: list[dict], column: str) -> int:
+        return cls._mask([i for i, room in enumerate(rooms) if room[column]], len(rooms))
+
+    @classmethod
+    def _threshold_index(cls, rooms: list[dict], column: str) -> tuple[list, list[int]]:
+        """Sorted distinct values and, per value, the bitmap of rooms >= it."""
+        by_value: dict = {}
+        for i, room in enumerate(rooms):
+            if room[column] is not None:  # NULL never satisfies a minimum
+                by_value.setdefault(room[column], []).append(i)
+
+        values = sorted(by_value)
+        masks = [0] * (len(values) + 1)  # trailing 0: above every value
+        for j in range(len(values) - 1, -1, -1):
+            masks[j] = masks[j + 1] | cls._mask(by_value[values[j]], len(rooms))
+        return values, masks
+
+    def candidates(
+        self,
+        min_capacity: Optional[int] = None,
+        needs_projector: Optional[bool] = None,
+        needs_whiteboard: Optional[bool] = None,
+        needs_accessible: Optional[bool] = None,
+        min_power_outlets: Optional[int] = None,
+    ) -> int:
+        """Bitmap of rooms meeting the requirements."""
+        mask = self.all
+        if needs_projector is True:
+            mask &= self.projector
+        if needs_whiteboard is True:
+            mask &= self.whiteboard
+        if needs_accessible is True:
+            mask &= self.accessible
+        if min_capacity is not None:
+            mask &= self.capacity_masks[bisect_left(self.capacity_values, min_capacity)]
+        if min_power_outlets is not None:
+            mask &= self.outlet_masks[bisect_left(self.outlet_values, min_power_outlets)]
+        return mask
+
+    def select(self, mask: int) -> list[dict]:
+        """Rooms whose bits are set in `mask`, in name order."""
+        if mask == self.all:
+            return list(self.rooms)
+        rooms = self.rooms
+        bits = bin(mask)[:1:-1]  # least significant bit first
+        result = []
+        i = bits.find("1")
+        while i != -1:
+            result.append(rooms[i])
+            i = bits.find("1", i + 1)
+        return result
+
+    def flags(self, mask: int) -> np.ndarray:
+        """Boolean array with one entry per room (name order) for `mask`."""
+        size = len(self.rooms)
+        packed = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(packed, count=size, bitorder="little").astype(bool)
+
+
+class RoomCatalog:
+    """Rooms ordered by name, with lookup by id."""
+
+    def __init__(self, db, check_interval: float = 60.0):
+        self.db = db
+        self.check_interval = check_interval
+        self.version = None
+        self._rooms: list[dict] = []
+        self._by_id: dict[int, dict] = {}
+        self.index = FacilityIndex([])
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+        # Counters for stats()
+        self.loads = 0
+        self.version_checks = 0
+        self.miss_checks = 0
+        self.invalidations = 0
+
+    def invalidate(self, table: str = "rooms"):
+        """
+        Force a reload on next access.
+
+        Used directly as a data_versions notify callback, so payloads naming
+        other tables are ignored; an empty payload means "anything may have
+        changed" (sent after the feed reconnects).
+        """
+        if table not in ("", "rooms"):
+            return
+        self._stale = True
+        self.invalidations += 1
+
+    async def _refresh(self, missed_at: Optional[float] = None):
+        async with self._lock:
+            due = time.monotonic() - self._checked_at >= self.check_interval
+            # After a lookup miss, a version check since the miss will do
+            missed = missed_at is not None and self._checked_at < missed_at
+            if not (self._stale or due or missed):
+                return  # another request refreshed while we waited
+
+            async with self.db.connection() as conn:
+                cur = await conn.execute("SELECT version FROM data_versions WHERE name = 'rooms'")
+                row = await cur.fetchone()
+                version = row["version"] if row else None
+                self._checked_at = time.monotonic()
+
+                if not self._stale:
+                    self.version_checks += 1
+                    if version == self.version:
+                        return
+
+                # Clear the flag first so an invalidation during the load sticks
+                self._stale = False
+                cur = await conn.execute(f"SELECT {ROOM_COLUMNS} FROM rooms ORDER BY name")
+                rooms = await cur.fetchall()
+
+            self._rooms = rooms
+            self._by_id = {room["id"]: room for room in rooms}
+            self.index = FacilityIndex(rooms)
+            self.version = version
+            self.loads += 1
+
+    async def _ensure_fresh(self):
+        if self._stale or time.monotonic() - self._checked_at >= self.check_interval:
+            await self._refresh()
+
+    async def rooms(self) -> list[dict]:
+        """All rooms ordered by name."""
+        await self._ensure_fresh()
+        return self._rooms
+
+    async def get(self, room_id: int) -> Optional[dict]:
+        """
+        Room by id, or None if it does not exist.
+
+        A miss compares the version once more before answering None, so a
+        room created since the last check is found even before its
+        notification arrives (or while the feed is down).
+        """
+        await self._ensure_fresh()
+        room = self._by_id.get(room_id)
+        if room is None:
+            self.miss_checks += 1
+            await self._refresh(missed_at=time.monotonic())
+            room = self._by_id.get(room_id)
+        return room
+
+    async def filter(
+        self,
+        min_capacity: Optional[int] = None,
+        needs_projector: Optional[bool] = None,
+        needs_whiteboard: Optional[bool] = None,
+        needs_accessible: Optional[bool] = None,
+        min_power_outlets: Optional[int] = None,
+    ) -> list[dict]:
+        """Rooms meeting the facility requirements, ordered by name."""
+        await self._ensure_fresh()
+        index = self.index
+        return index.select(index.candidates(
+            min_capacity=min_capacity,
+            needs_projector=needs_projector,
+            needs_whiteboard=needs_whiteboard,
+            needs_accessible=needs_accessible,
+            min_power_outlets=min_power_outlets,
+        ))
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "rooms": len(self._rooms),
+            "loads": self.loads,
+            "version_checks": self.version_checks,
+            "miss_checks": self.miss_checks,
+            "invalidations": self.invalidations,
+        }
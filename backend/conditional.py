@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Conditional Requests
+ETag / Last-Modified validators for GET endpoints.
+
+Endpoints derive a validator from state they already hold in memory (the
+room catalog version, the cached latest reading, the calendar change
+counter) and check it before querying or serializing anything; a client
+sending back the ETag (If-None-Match) or Last-Modified date
+(If-Modified-Since) of an unchanged resource gets an empty 304.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag built from the values that determine a response."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def http_date(value: datetime) -> str:
+    """HTTP date of a naive local (sensor_data style) or aware datetime."""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's copy is current; If-None-Match takes precedence over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison, as required for If-None-Match
+        return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have whole seconds
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional(request: Request, response: Response, etag: str, cache_control: str,
+                last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Empty 304 response if the client's copy is current, else None.
+
+    In both cases the validators and Cache-Control are set, on the 304 or
+    on `response` for the full answer.
+    """
+    headers = validator_headers(etag, cache_control, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Database Access
+Async PostgreSQL connection pool shared by the API endpoints.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg.types.numeric import FloatLoader
+from psycopg_pool import AsyncConnectionPool
+import psycopg_pool
+
+
+async def configure(conn: psycopg.AsyncConnection):
+    """
+    Load NUMERIC columns (DECIMAL(4,1) readings, rollup sums) as floats.
+
+    The API only ever converts them to float or JSON numbers, so Decimal
+    objects would just cost a conversion per value (see fastjson.py).
+    """
+    conn.adapters.register_loader("numeric", FloatLoader)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class Database:
+    """
+    Async pool of psycopg connections.
+
+    Keeps between `min_size` and `max_size` open connections. Borrowers wait
+    up to `timeout` seconds for a free connection; connections idle for longer
+    than `max_idle` seconds are closed, and idle connections are health-checked
+    every `check_interval` seconds in the background so request paths never
+    pay for a check. Connections run in autocommit mode, return rows as dicts
+    and load NUMERIC values as floats.
+    """
+
+    def __init__(
+        self,
+        min_size: int = 2,
+        max_size: int = 20,
+        timeout: float = 5.0,
+        check_interval: float = 30.0,
+        max_idle: float = 600.0,
+        **connect_kwargs,
+    ):
+        self.check_interval = check_interval
+        self.pool = AsyncConnectionPool(
+            kwargs={**connect_kwargs, "autocommit": True, "row_factory": dict_row},
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            max_idle=max_idle,
+            configure=configure,
+            open=False,
+        )
+        self._check_task = None
+
+    async def open(self):
+        """Open the pool, wait for `min_size` connections and start health checks."""
+        await self.pool.open(wait=True)
+        self._check_task = asyncio.create_task(self._check_loop())
+
+    async def close(self):
+        if self._check_task:
+            self._check_task.cancel()
+        await self.pool.close()
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            # Replaces broken idle connections; busy ones are checked on return
+            await self.pool.check()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow a connection for the duration of an `async with` block.
+
+        The connection is always returned to the pool (or discarded if it
+        broke), including when the block raises.
+        """
+        try:
+            async with self.pool.connection() as conn:
+                yield conn
+        except psycopg_pool.PoolTimeout as e:
+            raise PoolTimeout(str(e)) from e
+
+    def stats(self) -> dict:
+        """Return pool sizing and usage counters."""
+        stats = self.pool.get_stats()
+        requests = stats.get("requests_num", 0)
+        return {
+            "min_size": self.pool.min_size,
+            "max_size": self.pool.max_size,
+            "timeout": self.pool.timeout,
+            "size": stats.get("pool_size", 0),
+            "idle": stats.get("pool_available", 0),
+            "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "checkouts": requests,
+            "waits": stats.get("requests_queued", 0),
+            "timeouts": stats.get("requests_errors", 0),
+            "connects": stats.get("connections_num", 0),
+            "discarded": stats.get("connections_lost", 0),
+            "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / requests, 3) if requests else 0.0,
+        }
+
+
+async def connect(**connect_kwargs) -> psycopg.AsyncConnection:
+    """Open a dedicated autocommit connection (for LISTEN and long-running work)."""
+    conn = await psycopg.AsyncConnection.connect(**connect_kwargs, autocommit=True, row_factory=dict_row)
+    await configure(conn)
+    return conn
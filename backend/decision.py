@@ -10,9 +10,13 @@ Based on standards from docs/criteria.md:
 - WHO Housing and Health Guidelines
 """
 
+import heapq
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
+import numpy as np
+
 
 @dataclass
 class SensorReading:
@@ -223,12 +227,8 @@ def score_sound(value: float, ideal: Optional[float] = None) -> float:
     return max(0.0, 50.0 - (excess / max_excess) * 50.0)
 
 
-def calculate_room_score(reading: SensorReading, weights: Weights, desired_profile: Optional[DesiredProfile] = None) -> dict:
-    """
-    Calculate weighted comfort score for a room.
-
-    Returns dict with individual scores and final weighted score.
-    """
+def _weighted_score(reading: SensorReading, weights: Weights, desired_profile: Optional[DesiredProfile] = None) -> tuple[float, dict]:
+    """Return (unrounded final score, rounded individual scores) for a reading."""
     scores = {}
     weighted_sum = 0.0
     total_weight = 0.0
@@ -264,6 +264,17 @@ def calculate_room_score(reading: SensorReading, weights: Weights, desired_profi
     # Calculate final score (normalized if some readings missing)
     final_score = weighted_sum / total_weight if total_weight > 0 else 0.0
 
+    return final_score, scores
+
+
+def calculate_room_score(reading: SensorReading, weights: Weights, desired_profile: Optional[DesiredProfile] = None) -> dict:
+    """
+    Calculate weighted comfort score for a room.
+
+    Returns dict with individual scores and final weighted score.
+    """
+    final_score, scores = _weighted_score(reading, weights, desired_profile)
+
     return {
         "individual_scores": scores,
         "final_score": round(final_score, 1),
@@ -276,7 +287,12 @@ def calculate_room_score(reading: SensorReading, weights: Weights, desired_profi
     }
 
 
-def rank_rooms(rooms_data: list[dict], weights: Weights, desired_profile: Optional[DesiredProfile] = None) -> list[dict]:
+def rank_rooms(
+    rooms_data: list[dict],
+    weights: Weights,
+    desired_profile: Optional[DesiredProfile] = None,
+    top_k: Optional[int] = None,
+) -> list[dict]:
     """
     Rank multiple rooms by comfort score.
 
@@ -284,45 +300,462 @@ def rank_rooms(rooms_data: list[dict], weights: Weights, desired_profile: Option
         rooms_data: List of dicts with room_id and sensor data
         weights: User preference weights
         desired_profile: User's desired ideal values (optional)
+        top_k: Only return the best `top_k` rooms (optional)
 
     Returns:
-        List of rooms sorted by score (highest first)
+        List of rooms sorted by score (highest first). Equal scores keep
+        their order in rooms_data. With top_k, only the selected rooms get
+        a result payload, chosen with a heap instead of a full sort.
     """
-    results = []
+    scored = []
 
-    for room in rooms_data:
+    for index, room in enumerate(rooms_data):
         reading = SensorReading(
             temperature=room.get("temperature"),
             co2=room.get("co2"),
             humidity=room.get("humidity"),
             sound=room.get("sound"),
         )
+        final_score, scores = _weighted_score(reading, weights, desired_profile)
+        scored.append((round(final_score, 1), index, reading, scores))
 
-        score_result = calculate_room_score(reading, weights, desired_profile)
+    # Sort by score descending, ties by input position
+    def order(entry):
+        return -entry[0], entry[1]
+
+    if top_k is not None and top_k < len(scored):
+        selected = heapq.nsmallest(top_k, scored, key=order)
+    else:
+        selected = sorted(scored, key=order)
 
+    results = []
+    for rank, (score, index, reading, scores) in enumerate(selected, start=1):
+        room = rooms_data[index]
         results.append({
             "room_id": room["room_id"],
             "room_name": room.get("room_name", f"Room {room['room_id']}"),
-            "score": score_result["final_score"],
-            "individual_scores": score_result["individual_scores"],
+            "score": score,
+            "individual_scores": scores,
             "sensor_values": {
                 "temperature": reading.temperature,
                 "co2": reading.co2,
                 "humidity": reading.humidity,
                 "sound": reading.sound,
             },
+            "rank": rank,
         })
 
-    # Sort by score descending
-    results.sort(key=lambda x: x["score"], reverse=True)
+    return results
+
+
+# ============================================================
+# Vectorized scoring (whole columns of readings at once)
+# ============================================================
+#
+# The array functions mirror the scalar ones branch for branch: np.select
+# takes the first matching condition, like the if-chains above, and every
+# choice repeats the scalar arithmetic in the same order, so results are
+# bit-identical. Missing readings are NaN and stay NaN.
+
+def score_temperature_array(values: np.ndarray, ideal: Optional[float] = None) -> np.ndarray:
+    """Array version of score_temperature (unrounded)."""
+    c = CRITERIA["temperature"]
+    if ideal is None:
+        ideal = c["ideal"]
+    v = np.asarray(values, dtype=np.float64)
+    max_distance = max(ideal - c["good_min"], c["good_max"] - ideal)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [
+                v == ideal,
+                (c["good_min"] <= v) & (v <= c["good_max"]),
+                (c["acceptable_min"] <= v) & (v < c["good_min"]),
+                (c["good_max"] < v) & (v <= c["acceptable_max"]),
+                v < c["acceptable_min"],
+            ],
+            [
+                100.0,
+                100.0 - (np.abs(v - ideal) / max_distance) * 20.0,
+                80.0 - ((c["good_min"] - v) / (c["good_min"] - c["acceptable_min"])) * 30.0,
+                80.0 - ((v - c["good_max"]) / (c["acceptable_max"] - c["good_max"])) * 30.0,
+                np.maximum(0.0, 50.0 - (c["acceptable_min"] - v) * 10.0),
+            ],
+            np.maximum(0.0, 50.0 - (v - c["acceptable_max"]) * 10.0),
+        )
+
+
+def score_co2_array(values: np.ndarray, ideal: Optional[int] = None) -> np.ndarray:
+    """Array version of score_co2 (unrounded)."""
+    c = CRITERIA["co2"]
+    if ideal is None:
+        ideal = c["ideal"]
+    v = np.asarray(values, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [
+                v <= ideal,
+                v <= c["good_max"],
+                v <= c["acceptable_max"],
+                v <= c["poor_threshold"],
+            ],
+            [
+                100.0,
+                100.0 - ((v - ideal) / (c["good_max"] - ideal)) * 10.0,
+                90.0 - ((v - c["good_max"]) / (c["acceptable_max"] - c["good_max"])) * 20.0,
+                70.0 - ((v - c["acceptable_max"]) / (c["poor_threshold"] - c["acceptable_max"])) * 20.0,
+            ],
+            np.maximum(0.0, 50.0 - (v - c["poor_threshold"]) * 0.1),
+        )
+
+
+def score_humidity_array(values: np.ndarray, ideal: Optional[float] = None) -> np.ndarray:
+    """Array version of score_humidity (unrounded)."""
+    c = CRITERIA["humidity"]
+    if ideal is not None:
+        ideal_min = ideal - 5.0
+        ideal_max = ideal + 5.0
+    else:
+        ideal_min = c["ideal_min"]
+        ideal_max = c["ideal_max"]
+    v = np.asarray(values, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [
+                (ideal_min <= v) & (v <= ideal_max),
+                (c["good_min"] <= v) & (v < ideal_min),
+                (ideal_max < v) & (v <= c["good_max"]),
+                (c["acceptable_min"] <= v) & (v < c["good_min"]),
+                (c["good_max"] < v) & (v <= c["acceptable_max"]),
+                v < c["acceptable_min"],
+            ],
+            [
+                100.0,
+                100.0 - ((ideal_min - v) / (ideal_min - c["good_min"])) * 20.0,
+                100.0 - ((v - ideal_max) / (c["good_max"] - ideal_max)) * 20.0,
+                80.0 - ((c["good_min"] - v) / (c["good_min"] - c["acceptable_min"])) * 30.0,
+                80.0 - ((v - c["good_max"]) / (c["acceptable_max"] - c["good_max"])) * 30.0,
+                np.maximum(0.0, 50.0 - (c["acceptable_min"] - v) * 2.5),
+            ],
+            np.maximum(0.0, 50.0 - (v - c["acceptable_max"]) * 2.5),
+        )
+
+
+def score_sound_array(values: np.ndarray, ideal: Optional[float] = None) -> np.ndarray:
+    """Array version of score_sound (unrounded)."""
+    c = CRITERIA["sound"]
+    if ideal is None:
+        ideal = c["ideal"]
+    v = np.asarray(values, dtype=np.float64)
+    max_excess = c["poor_threshold"] - c["acceptable_max"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [
+                v <= ideal,
+                v <= c["good_max"],
+                v <= c["acceptable_max"],
+            ],
+            [
+                100.0,
+                100.0 - ((v - ideal) / (c["good_max"] - ideal)) * 20.0,
+                80.0 - ((v - c["good_max"]) / (c["acceptable_max"] - c["good_max"])) * 30.0,
+            ],
+            np.maximum(0.0, 50.0 - ((v - c["acceptable_max"]) / max_excess) * 50.0),
+        )
+
+
+def round_array(values: np.ndarray, digits: int = 1) -> np.ndarray:
+    """
+    Round like Python's round(x, digits), element-wise.
+
+    np.round scales by 10**digits first, which can push a value sitting next
+    to a .5 boundary across it; those few near-ties are re-rounded with
+    round() so the result matches the scalar path exactly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, digits)
+    scaled = values * 10.0 ** digits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded.flat[i] = round(float(values.flat[i]), digits)
+    return rounded
+
+
+ARRAY_SCORERS = {
+    "temperature": score_temperature_array,
+    "co2": score_co2_array,
+    "humidity": score_humidity_array,
+    "sound": score_sound_array,
+}
 
-    # Add rank
-    for i, room in enumerate(results):
-        room["rank"] = i + 1
+
+# ============================================================
+# Lookup tables (every value the database can store)
+# ============================================================
+#
+# Readings have a fixed resolution and range (database/schema.sql), so each
+# criterion has a small finite domain: 601 temperatures, 4701 CO2 values,
+# 1001 humidities and 1301 sound levels. Scoring a stored reading is then
+# an index into a precomputed table instead of branch evaluation.
+
+# (lowest, highest, steps per unit) from the column types and valid_* CHECKs
+VALUE_DOMAIN = {
+    "temperature": (-10, 50, 10),  # DECIMAL(4,1)
+    "co2": (300, 5000, 1),         # INTEGER
+    "humidity": (0, 100, 10),      # DECIMAL(4,1)
+    "sound": (0, 130, 10),         # DECIMAL(4,1)
+}
+
+# Tables kept for custom ideals (at most ~37 KB each, for CO2)
+SCORE_TABLE_CACHE_SIZE = 256
+
+
+def domain_values(criterion: str) -> np.ndarray:
+    """Every storable value of a criterion, lowest first."""
+    low, high, steps = VALUE_DOMAIN[criterion]
+    # k / steps is the same double as the stored decimal converted to float
+    return np.arange(low * steps, high * steps + 1) / steps
+
+
+@lru_cache(maxsize=SCORE_TABLE_CACHE_SIZE)
+def score_table(criterion: str, ideal: Optional[float] = None) -> np.ndarray:
+    """
+    Rounded score of every storable value, indexed by steps above the lowest.
+
+    The default-ideal tables are built once; tables for custom DesiredProfile
+    ideals are built on first use and kept in an LRU cache.
+    """
+    table = round_array(ARRAY_SCORERS[criterion](domain_values(criterion), ideal), 1)
+    table.flags.writeable = False
+    return table
+
+
+def score_lookup(criterion: str, values: np.ndarray, ideal: Optional[float] = None) -> np.ndarray:
+    """
+    Rounded scores of a column via score_table.
+
+    Values off the stored grid (e.g. not read from the database) are scored
+    with the array functions instead; NaN stays NaN.
+    """
+    low, high, steps = VALUE_DOMAIN[criterion]
+    table = score_table(criterion, ideal)
+    values = np.asarray(values, dtype=np.float64)
+
+    with np.errstate(invalid="ignore"):
+        position = np.rint(values * steps)
+        on_grid = (position >= low * steps) & (position <= high * steps) & (position / steps == values)
+
+    scores = np.full(values.shape, np.nan)
+    scores[on_grid] = table[position[on_grid].astype(np.intp) - low * steps]
+    off_grid = ~on_grid & ~np.isnan(values)
+    if off_grid.any():
+        scores[off_grid] = round_array(ARRAY_SCORERS[criterion](values[off_grid], ideal), 1)
+    return scores
+
+
+def score_columns(
+    columns: dict[str, np.ndarray],
+    desired_profile: Optional[DesiredProfile] = None,
+    lookup: bool = True,
+) -> dict[str, np.ndarray]:
+    """
+    Rounded individual scores per criterion; NaN where the reading is missing.
+
+    With `lookup` the scores come from the precomputed tables, otherwise the
+    curves are evaluated directly.
+    """
+    scores = {}
+    for criterion, scorer in ARRAY_SCORERS.items():
+        ideal = getattr(desired_profile, criterion) if desired_profile else None
+        if lookup:
+            scores[criterion] = score_lookup(criterion, columns[criterion], ideal)
+        else:
+            scores[criterion] = round_array(scorer(columns[criterion], ideal), 1)
+    return scores
+
+
+def weighted_scores(scores: dict[str, np.ndarray], weights: Weights) -> np.ndarray:
+    """
+    Final scores (rounded) from individual score columns.
+
+    Same semantics as calculate_room_score: missing criteria drop out and the
+    remaining weights are renormalized; no readings at all scores 0.
+    """
+    weighted_sum = 0.0
+    total_weight = 0.0
+    for criterion in ARRAY_SCORERS:
+        present = ~np.isnan(scores[criterion])
+        weight = getattr(weights, criterion)
+        weighted_sum = weighted_sum + np.where(present, scores[criterion] * weight, 0.0)
+        total_weight = total_weight + np.where(present, weight, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final = np.where(total_weight > 0, weighted_sum / total_weight, 0.0)
+    return round_array(final, 1)
+
+
+def top_k_order(final: np.ndarray, top_k: Optional[int] = None) -> np.ndarray:
+    """Indices by score descending, ties by position, optionally only the best top_k."""
+    if top_k is not None and top_k < len(final):
+        # Keep everything tied with the k-th best so ties still break by position
+        threshold = -np.partition(-final, top_k - 1)[top_k - 1]
+        candidates = np.flatnonzero(final >= threshold)
+        return candidates[np.argsort(-final[candidates], kind="stable")][:top_k]
+    return np.argsort(-final, kind="stable")
+
+
+def rank_rooms_arrays(
+    room_ids: list[int],
+    room_names: list[str],
+    columns: dict[str, np.ndarray],
+    weights: Weights,
+    desired_profile: Optional[DesiredProfile] = None,
+    top_k: Optional[int] = None,
+    lookup: bool = True,
+) -> list[dict]:
+    """
+    Column-oriented rank_rooms.
+
+    Args:
+        room_ids, room_names: one entry per room
+        columns: "temperature", "co2", "humidity", "sound" arrays aligned with
+            room_ids, NaN for missing readings
+        weights, desired_profile, top_k: as for rank_rooms
+        lookup: score through the lookup tables (see score_columns)
+
+    Returns the same list of result dicts as rank_rooms would.
+    """
+    scores = score_columns(columns, desired_profile, lookup)
+    final = weighted_scores(scores, weights)
+
+    results = []
+    for rank, i in enumerate(top_k_order(final, top_k), start=1):
+        individual = {}
+        sensor_values = {}
+        for criterion in ARRAY_SCORERS:
+            value = columns[criterion][i]
+            if np.isnan(value):
+                sensor_values[criterion] = None
+            else:
+                individual[criterion] = float(scores[criterion][i])
+                sensor_values[criterion] = int(value) if criterion == "co2" else float(value)
+        results.append({
+            "room_id": room_ids[i],
+            "room_name": room_names[i],
+            "score": float(final[i]),
+            "individual_scores": individual,
+            "sensor_values": sensor_values,
+            "rank": rank,
+        })
 
     return results
 
 
+# ============================================================
+# Batch ranking (many requests over the same rooms)
+# ============================================================
+
+def weighted_score_matrix(scores: dict[str, np.ndarray], weights: list[Weights]) -> np.ndarray:
+    """
+    weighted_scores for many weight vectors at once: rooms x len(weights).
+
+    This is the rooms x criteria by criteria x users product, accumulated
+    one criterion at a time in the same order as the scalar path. A matmul
+    would reorder the additions and could move results across rounding ties.
+    """
+    weighted_sum = 0.0
+    total_weight = 0.0
+    for criterion in ARRAY_SCORERS:
+        present = ~np.isnan(scores[criterion])[:, None]
+        column = np.array([getattr(w, criterion) for w in weights], dtype=np.float64)[None, :]
+        weighted_sum = weighted_sum + np.where(present, scores[criterion][:, None] * column, 0.0)
+        total_weight = total_weight + np.where(present, column, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final = np.where(total_weight > 0, weighted_sum / total_weight, 0.0)
+    return round_array(final, 1)
+
+
+def rank_rooms_batch(
+    room_ids: list[int],
+    room_names: list[str],
+    columns: dict[str, np.ndarray],
+    requests: list[tuple[Weights, Optional[DesiredProfile], np.ndarray]],
+    top_k: Optional[int] = None,
+    chunk_size: int = 1024,
+) -> list[list[dict]]:
+    """
+    rank_rooms_arrays for many requests over the same rooms.
+
+    Args:
+        room_ids, room_names, columns: as for rank_rooms_arrays
+        requests: (weights, desired_profile, candidates) per request, where
+            candidates is a boolean array of the rooms it may be offered
+        top_k: keep only the best N rooms of every ranking
+        chunk_size: requests scored per matrix, bounding memory to
+            rooms x chunk_size floats per temporary
+
+    Requests with the same desired profile share their individual scores,
+    so each distinct profile is scored once. Returns one ranking per
+    request, each equal to rank_rooms_arrays on its candidate rooms.
+    """
+    rankings: list[Optional[list[dict]]] = [None] * len(requests)
+    sensor_values: dict[int, dict] = {}  # shared by every ranking
+
+    def values_of(i: int) -> dict:
+        if i not in sensor_values:
+            sensor_values[i] = {
+                criterion: None if np.isnan(columns[criterion][i])
+                else int(columns[criterion][i]) if criterion == "co2" else float(columns[criterion][i])
+                for criterion in ARRAY_SCORERS
+            }
+        return sensor_values[i]
+
+    groups: dict = {}
+    for position, (_, profile, _) in enumerate(requests):
+        key = tuple(getattr(profile, c) for c in ARRAY_SCORERS) if profile else None
+        groups.setdefault(key, []).append(position)
+
+    for members in groups.values():
+        scores = score_columns(columns, requests[members[0]][1])
+        individual: dict[int, dict] = {}
+
+        def scores_of(i: int) -> dict:
+            if i not in individual:
+                individual[i] = {
+                    criterion: float(scores[criterion][i])
+                    for criterion in ARRAY_SCORERS if not np.isnan(scores[criterion][i])
+                }
+            return individual[i]
+
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start:start + chunk_size]
+            allowed = np.column_stack([requests[p][2] for p in chunk])
+            final = weighted_score_matrix(scores, [requests[p][0] for p in chunk])
+            # Stable sort: ties keep room order, as in rank_rooms
+            order = np.argsort(-np.where(allowed, final, -np.inf), axis=0, kind="stable")
+            counts = allowed.sum(axis=0)
+
+            for j, p in enumerate(chunk):
+                count = int(counts[j]) if top_k is None else min(top_k, int(counts[j]))
+                rankings[p] = [
+                    {
+                        "room_id": room_ids[i],
+                        "room_name": room_names[i],
+                        "score": float(final[i, j]),
+                        "individual_scores": scores_of(i),
+                        "sensor_values": values_of(i),
+                        "rank": rank,
+                    }
+                    for rank, i in enumerate(order[:count, j].tolist(), start=1)
+                ]
+
+    return rankings
+
+
 # ============================================================
 # Test with sample data
 # ============================================================
@@ -401,5 +834,98 @@ def test_scoring():
         print(f"  #{room['rank']} {room['room_name']}: Score = {room['score']}")
 
 
+def check_vectorized(samples: int = 2000, seed: int = 0) -> int:
+    """
+    Compare the array scoring path with the scalar one; returns mismatches.
+
+    Covers every value the schema can store (DECIMAL(4,1) within the CHECK
+    ranges, integer CO2), random off-grid values, random custom ideals, the
+    lookup tables, random rooms with missing readings ranked through both
+    rank_rooms paths, and rank_rooms_batch against single rankings.
+    """
+    import random
+
+    rng = random.Random(seed)
+    scalar = {"temperature": score_temperature, "co2": score_co2,
+              "humidity": score_humidity, "sound": score_sound}
+    domain = {
+        "temperature": [i / 10 for i in range(-100, 501)],
+        "co2": list(range(300, 5001)),
+        "humidity": [i / 10 for i in range(0, 1001)],
+        "sound": [i / 10 for i in range(0, 1301)],
+    }
+    mismatches = 0
+
+    for criterion, score in scalar.items():
+        values = domain[criterion] + [rng.uniform(-20.0, 6000.0) for _ in range(samples)]
+        for ideal in [None] + rng.sample(domain[criterion], 20):
+            vectorized = round_array(ARRAY_SCORERS[criterion](np.array(values), ideal), 1)
+            looked_up = score_lookup(criterion, np.array(values), ideal)
+            for value, got, table_got in zip(values, vectorized, looked_up):
+                expected = round(score(value, ideal), 1)
+                if got != expected or table_got != expected:
+                    mismatches += 1
+
+    def maybe(value):
+        return None if rng.random() < 0.15 else value
+
+    for _ in range(samples // 10):
+        rooms = [
+            {"room_id": i, "room_name": f"Room {i}",
+             "temperature": maybe(rng.randint(150, 300) / 10), "co2": maybe(rng.randint(400, 1600)),
+             "humidity": maybe(rng.randint(250, 750) / 10), "sound": maybe(rng.randint(250, 600) / 10)}
+            for i in range(rng.randint(1, 40))
+        ]
+        weights = Weights(*(rng.choice([0.0, 0.1, 0.25, 0.3, 1 / 3]) for _ in range(4)))
+        profile = None
+        if rng.random() < 0.5:
+            profile = DesiredProfile(rng.randint(180, 260) / 10, rng.randint(400, 900),
+                                     rng.randint(300, 700) / 10, rng.randint(250, 400) / 10)
+        top_k = rng.choice([None, 1, 3, 10])
+        columns = {
+            criterion: np.array([np.nan if room[criterion] is None else room[criterion] for room in rooms])
+            for criterion in ARRAY_SCORERS
+        }
+        expected = rank_rooms(rooms, weights, profile, top_k)
+        for lookup in (False, True):
+            got = rank_rooms_arrays([room["room_id"] for room in rooms], [room["room_name"] for room in rooms],
+                                    columns, weights, profile, top_k, lookup)
+            if got != expected:
+                mismatches += 1
+
+    for _ in range(samples // 100):
+        count = rng.randint(1, 60)
+        columns = {
+            "temperature": np.array([rng.choice([np.nan, rng.randint(150, 300) / 10]) for _ in range(count)]),
+            "co2": np.array([rng.choice([np.nan, float(rng.randint(400, 1600))]) for _ in range(count)]),
+            "humidity": np.array([rng.choice([np.nan, rng.randint(250, 750) / 10]) for _ in range(count)]),
+            "sound": np.array([rng.choice([np.nan, rng.randint(250, 600) / 10]) for _ in range(count)]),
+        }
+        profiles = [None, DesiredProfile(22.0, 600, 45.0, 30.0), DesiredProfile(21.5, 500, 50.0, 35.0)]
+        requests = [
+            (Weights(*(rng.choice([0.0, 0.1, 0.25, 0.3, 1 / 3]) for _ in range(4))),
+             rng.choice(profiles), np.array([rng.random() < 0.7 for _ in range(count)], dtype=bool))
+            for _ in range(rng.randint(1, 30))
+        ]
+        top_k = rng.choice([None, 1, 5])
+        ids = list(range(count))
+        names = [f"Room {i}" for i in ids]
+        batch = rank_rooms_batch(ids, names, columns, requests, top_k, chunk_size=7)
+        for (weights, profile, allowed), got in zip(requests, batch):
+            subset = np.flatnonzero(allowed)
+            expected = rank_rooms_arrays([ids[i] for i in subset], [names[i] for i in subset],
+                                         {c: v[subset] for c, v in columns.items()},
+                                         weights, profile, top_k)
+            if got != expected:
+                mismatches += 1
+
+    print(f"Vectorized scoring check: {mismatches} mismatches")
+    return mismatches
+
+
 if __name__ == "__main__":
+    import sys
+
+    if "--verify" in sys.argv:
+        sys.exit(1 if check_vectorized() else 0)
     test_scoring()
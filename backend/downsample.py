@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Series Downsampling
+Largest-Triangle-Three-Buckets (LTTB) selection over a regular time grid.
+
+The database averages readings into a fine grid of equal time slots (empty
+slots included), and this module picks one slot per output bucket, so a
+chart of any range costs a fixed number of points. Buckets without any
+reading stay empty, which keeps sensor gaps visible.
+"""
+
+from typing import Optional
+
+Sample = Optional[tuple[Optional[float], ...]]
+
+
+def _ranges(samples: list[Sample]) -> list[float]:
+    """Value range per series, used to weigh the series equally."""
+    ranges = []
+    for series in range(len(next(s for s in samples if s is not None))):
+        values = [s[series] for s in samples if s is not None and s[series] is not None]
+        spread = max(values) - min(values) if values else 0.0
+        ranges.append(spread or 1.0)
+    return ranges
+
+
+def _area(a: tuple[float, tuple], b: tuple[float, tuple], c: tuple[float, tuple], ranges: list[float]) -> float:
+    """Triangle area a-b-c summed over the series present in all three points."""
+    (xa, ya), (xb, yb), (xc, yc) = a, b, c
+    area = 0.0
+    for series, spread in enumerate(ranges):
+        if ya[series] is None or yb[series] is None or yc[series] is None:
+            continue
+        area += abs((xa - xc) * (yb[series] - ya[series]) - (xa - xb) * (yc[series] - ya[series])) / spread
+    return area
+
+
+def _average(group: list[tuple[int, tuple]]) -> tuple[float, tuple]:
+    """Mean slot and mean value per series of a bucket (None if no values)."""
+    x = sum(slot for slot, _ in group) / len(group)
+    means = []
+    for series in range(len(group[0][1])):
+        values = [values[series] for _, values in group if values[series] is not None]
+        means.append(sum(values) / len(values) if values else None)
+    return x, tuple(means)
+
+
+def lttb_select(samples: list[Sample], buckets: int) -> list[Optional[int]]:
+    """
+    Pick one sample per bucket, LTTB style.
+
+    Args:
+        samples: one entry per grid slot, a tuple of series values (entries
+            may be None) or None for an empty slot
+        buckets: number of output buckets; slots are split evenly
+
+    Returns the chosen slot index per bucket, or None for buckets without
+    samples. Within a bucket the sample forming the largest triangle with
+    the previously chosen sample and the average of the next non-empty
+    bucket wins; with no previous sample the first one is taken, with no
+    next bucket the last one.
+    """
+    if buckets <= 0 or not samples:
+        return []
+
+    groups = []
+    for bucket in range(buckets):
+        lo = bucket * len(samples) // buckets
+        hi = (bucket + 1) * len(samples) // buckets
+        groups.append([(slot, samples[slot]) for slot in range(lo, hi) if samples[slot] is not None])
+    if not any(groups):
+        return [None] * buckets
+
+    ranges = _ranges(samples)
+    averages = [_average(group) if group else None for group in groups]
+
+    selected: list[Optional[int]] = []
+    previous = None
+    for bucket, group in enumerate(groups):
+        if not group:
+            selected.append(None)
+            continue
+
+        following = next((avg for avg in averages[bucket + 1:] if avg is not None), None)
+        if previous is None:
+            choice = group[0]
+        elif following is None:
+            choice = group[-1]
+        else:
+            choice = max(group, key=lambda sample: _area(previous, sample, following, ranges))
+
+        selected.append(choice[0])
+        previous = choice
+
+    return selected
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Sensor Export
+Streams sensor_data out of the database for offline analysis.
+
+Rows never become Python objects: each room's readings are produced by
+`COPY (SELECT ...) TO STDOUT`, already formatted as CSV or NDJSON by the
+server, and the bytes are regrouped into large chunks for the HTTP
+response. Memory use is one chunk per export, however long the range.
+"""
+
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+COLUMNS = ("id", "room_id", "timestamp", "temperature", "co2", "humidity", "sound")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Output row per reading r. COPY text format escapes backslashes and control
+# characters; the JSON of a reading holds only numbers and an ISO
+# timestamp, so nothing is escaped.
+ROW_EXPRESSIONS = {
+    "csv": "r.*",
+    "ndjson": "row_to_json(r)",
+}
+
+COPY_OPTIONS = {
+    "csv": "FORMAT csv",
+    "ndjson": "FORMAT text",
+}
+
+
+def header(fmt: str) -> bytes:
+    """Bytes written before the first room (the CSV header line)."""
+    return (",".join(COLUMNS) + "\n").encode() if fmt == "csv" else b""
+
+
+def copy_query(fmt: str, start: Optional[datetime], end: Optional[datetime]) -> tuple[str, list]:
+    """COPY statement for one room (first parameter), ordered by (timestamp, id)."""
+    where = ""
+    params = []
+    if start:
+        where += " AND timestamp >= %s"
+        params.append(start)
+    if end:
+        where += " AND timestamp <= %s"
+        params.append(end)
+    query = f"""
+        COPY (
+            SELECT {ROW_EXPRESSIONS[fmt]}
+            FROM (SELECT {", ".join(COLUMNS)} FROM sensor_data WHERE room_id = %s{where}) r
+            ORDER BY r.timestamp, r.id
+        ) TO STDOUT WITH ({COPY_OPTIONS[fmt]})
+    """
+    return query, params
+
+
+async def export_chunks(conn, fmt: str, room_ids: list[int], start: Optional[datetime],
+                        end: Optional[datetime], chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Yield the export of `room_ids` (in that order) in chunks of about `chunk_size` bytes.
+
+    If the consumer stops early (closes or cancels the generator), the
+    `copy()` block exits with that exception: psycopg cancels the COPY on
+    the server and reads the rest of its output, so the connection goes
+    back to the pool idle and is reused.
+    """
+    query, params = copy_query(fmt, start, end)
+    buffer = bytearray(header(fmt))
+    async with conn.cursor() as cur:
+        for room_id in room_ids:
+            # One statement per room keeps each one a plain index range scan
+            async with cur.copy(query, [room_id, *params]) as copy:
+                async for data in copy:
+                    buffer += data
+                    if len(buffer) >= chunk_size:
+                        yield bytes(buffer)
+                        buffer.clear()
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Fast JSON Responses
+Encodes endpoint results with orjson instead of FastAPI's response_model path.
+
+With a response_model, FastAPI validates every row into a pydantic model,
+dumps it back to Python and encodes that with the json module. The rows the
+endpoints return already have exactly the model's fields (they come from
+queries selecting those columns, the room catalog or the decision module),
+so the list endpoints return a FastJSONResponse instead: FastAPI passes
+Response objects through untouched, and orjson encodes the row dicts
+directly, datetimes and NumPy values natively (NUMERIC columns already
+arrive as floats, see db.py; stray Decimals are encoded as floats too). The
+response_model declarations stay, so the OpenAPI schema is unchanged.
+`python benchmark.py serialize` compares the per-row cost of both paths.
+"""
+
+from decimal import Decimal
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Response for `content`, keeping the headers an endpoint set on its
+    `response` parameter (FastAPI drops them once a Response is returned).
+    """
+    headers = None
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return FastJSONResponse(content, headers=headers)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Sensor Feed
+Follows new sensor_data rows written by any ingest path (simulator, gateways).
+
+The `sensor_data_notify` trigger in database/schema.sql sends a NOTIFY once
+per INSERT/COPY statement. The feed LISTENs on a dedicated connection and,
+per notification burst, fetches every row with an id above the last one it
+has seen, then hands the batch to its subscribers. Only rows stamped within
+`window` of now are followed, which keeps the lookup on the newest
+sensor_data partitions; backfilled old readings are never the latest ones. The same connection can
+watch other channels (e.g. data_versions) and pass their payloads on.
+
+Ids are handed out before commit, so concurrent writers commit out of id
+order: a COPY still in flight leaves a hole below ids that were already
+read. The feed remembers such holes and reads them again on every poll
+until the transactions that may fill them have ended (all transactions in
+progress `SETTLE` seconds after the ids were read, by the snapshot xmin),
+so every committed row is delivered exactly once. Without notifications
+the feed still polls every `poll_interval` seconds; `is_current` tells
+whether it is connected and has polled recently.
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable
+
+import psycopg
+
+from db import connect
+
+# Channel used by the notify_sensor_data() trigger function
+CHANNEL = "sensor_data"
+
+# Rows fetched per query when catching up after a gap
+FETCH_CHUNK = 10000
+
+# Seconds after reading an id until every transaction that allocated an id
+# at or below it is assumed to hold an xid (nextval runs just before the
+# row is written, which assigns it)
+SETTLE = 1.0
+
+# Lowest still running xid and next xid to be assigned
+SNAPSHOT_QUERY = """
+    SELECT pg_snapshot_xmin(s)::text::bigint AS xmin, pg_snapshot_xmax(s)::text::bigint AS xmax
+    FROM pg_current_snapshot() s
+"""
+
+FEED_COLUMNS = "s.id, s.room_id, s.timestamp, s.temperature, s.co2, s.humidity, s.sound"
+
+
+class SensorFeed:
+    """
+    Background task that turns sensor_data notifications into row batches.
+
+    Subscribers are called on the event loop with a list of row dicts
+    (id, room_id, timestamp, temperature, co2, humidity, sound) in id order.
+    Rows filling a hole arrive after rows with higher ids.
+    """
+
+    def __init__(self, connect_kwargs: dict, reconnect_delay: float = 5.0,
+                 window: timedelta = timedelta(days=1), poll_interval: float = 2.0):
+        self.connect_kwargs = connect_kwargs
+        self.reconnect_delay = reconnect_delay
+        self.window = window
+        self.poll_interval = poll_interval
+        self._subscribers: list[Callable[[list[dict]], None]] = []
+        self._watchers: dict[str, list[Callable[[str], None]]] = {}
+        self._task = None
+        self._last_id = None
+        self._holes: list[tuple[int, int]] = []     # id ranges <= _last_id not seen yet
+        self._pending: deque[list] = deque()        # [id, read at, xmax or None] to settle
+        self._settled_id = None                     # no row <= this is missing any more
+        self._start_id = None                       # _last_id when the feed started
+        self._polled_at = None
+
+        # Counters for stats()
+        self.batches = 0
+        self.rows = 0
+        self.late_rows = 0
+        self.errors = 0
+        self.connected = False
+        self.last_batch_at = None
+
+    def subscribe(self, callback: Callable[[list[dict]], None]):
+        """Register a callback for new row batches."""
+        self._subscribers.append(callback)
+
+    def watch(self, channel: str, callback: Callable[[str], None]):
+        """Also LISTEN on `channel` and call back with each notification payload."""
+        self._watchers.setdefault(channel, []).append(callback)
+
+    def start(self):
+        """Start following notifications (must be called on the event loop)."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except psycopg.Error as e:
+                self.errors += 1
+                self.connected = False
+                print(f"Sensor feed error: {e}; reconnecting in {self.reconnect_delay}s")
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self):
+        conn = await connect(**self.connect_kwargs)
+        try:
+            for channel in [CHANNEL, *self._watchers]:
+                await conn.execute(f"LISTEN {channel}")
+            if self._last_id is None:
+                cur = await conn.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM sensor_data")
+                self._last_id = self._start_id = (await cur.fetchone())["max_id"]
+                # Rows of transactions in flight now may land below it
+                self._pending.append([self._last_id, time.monotonic(), None])
+            self.connected = True
+
+            # Catch up on anything written or changed while disconnected
+            await self._fetch_new(conn)
+            for channel in self._watchers:
+                self._dispatch(channel, "")
+
+            while True:
+                # The connection can't run queries while notifies() iterates;
+                # notifications that arrive during a fetch are queued and
+                # returned by the next notifies() call.
+                # A quiet period polls anyway, to settle holes and to notice
+                # a dead connection
+                async for notify in conn.notifies(timeout=self.poll_interval, stop_after=1):
+                    if notify.channel != CHANNEL:
+                        self._dispatch(notify.channel, notify.payload)
+                await self._fetch_new(conn)
+        finally:
+            self.connected = False
+            await conn.close()
+
+    def _dispatch(self, channel: str, payload: str):
+        for callback in self._watchers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Sensor feed watcher for {channel} failed: {e}")
+
+    @property
+    def settled_id(self) -> int:
+        """Every committed row with an id at or below this has been delivered (0 until it has settled after starting)."""
+        return self._settled_id or 0
+
+    def is_current(self, max_lag: float) -> bool:
+        """
+        Whether every row committed up to `max_lag` seconds ago was delivered:
+        connected, polled within `max_lag`, and past the transactions that
+        were in flight when the feed started.
+        """
+        return (self.connected and self._polled_at is not None
+                and time.monotonic() - self._polled_at <= max_lag
+                and self._settled_id is not None and self._settled_id >= self._start_id)
+
+    async def _fetch_new(self, conn):
+        # Taken before the hole scan, so the scan sees every transaction
+        # below its xmin
+        cur = await conn.execute(SNAPSHOT_QUERY)
+        snapshot = await cur.fetchone()
+
+        since = datetime.now() - self.window
+        if self._holes:
+            cur = await conn.execute(f"""
+                SELECT {FEED_COLUMNS}
+                FROM sensor_data s
+                JOIN unnest(%s::bigint[], %s::bigint[]) AS h(lo, hi) ON s.id BETWEEN h.lo AND h.hi
+                WHERE s.timestamp >= %s
+                ORDER BY s.id
+            """, ([lo for lo, _ in self._holes], [hi for _, hi in self._holes], since))
+            rows = await cur.fetchall()
+            if rows:
+                self._fill_holes([row["id"] for row in rows])
+                self.late_rows += len(rows)
+                self._deliver(rows)
+        self._settle(snapshot)
+
+        while True:
+            cur = await conn.execute(f"""
+                SELECT {FEED_COLUMNS}
+                FROM sensor_data s
+                WHERE s.id > %s AND s.timestamp >= %s
+                ORDER BY s.id
+                LIMIT %s
+            """, (self._last_id, since, FETCH_CHUNK))
+            rows = await cur.fetchall()
+            if not rows:
+                break
+
+            previous = self._last_id
+            for row in rows:
+                if row["id"] > previous + 1:
+                    self._holes.append((previous + 1, row["id"] - 1))
+                previous = row["id"]
+            self._last_id = rows[-1]["id"]
+            self._pending.append([self._last_id, time.monotonic(), None])
+            self._deliver(rows)
+
+            if len(rows) < FETCH_CHUNK:
+                break
+        self._polled_at = time.monotonic()
+
+    def _settle(self, snapshot: dict):
+        """Forget holes that no running transaction can fill any more."""
+        now = time.monotonic()
+        for entry in self._pending:
+            if entry[2] is None and now - entry[1] >= SETTLE:
+                # Transactions holding ids <= entry[0] have xids below this
+                entry[2] = snapshot["xmax"]
+        settled = None
+        while self._pending and self._pending[0][2] is not None and self._pending[0][2] <= snapshot["xmin"]:
+            settled = self._pending.popleft()[0]
+        if settled is not None:
+            self._settled_id = settled
+            self._holes = [(max(lo, settled + 1), hi) for lo, hi in self._holes if hi > settled]
+
+    def _fill_holes(self, ids: list[int]):
+        """Remove the (sorted) ids found in holes from them."""
+        holes = []
+        position = 0
+        for lo, hi in self._holes:
+            while position < len(ids) and ids[position] <= hi:
+                if ids[position] > lo:
+                    holes.append((lo, ids[position] - 1))
+                lo = ids[position] + 1
+                position += 1
+            if lo <= hi:
+                holes.append((lo, hi))
+        self._holes = holes
+
+    def _deliver(self, rows: list[dict]):
+        self.batches += 1
+        self.rows += len(rows)
+        self.last_batch_at = time.time()
+        for callback in self._subscribers:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Sensor feed subscriber failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "last_id": self._last_id,
+            "settled_id": self._settled_id,
+            "holes": sum(hi - lo + 1 for lo, hi in self._holes),
+            "batches": self.batches,
+            "rows": self.rows,
+            "late_rows": self.late_rows,
+            "errors": self.errors,
+            "last_batch_at": self.last_batch_at,
+        }
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Sensor History Queries
+Builds the /api/sensors/{room_id} queries: raw rows, time buckets and
+fixed-size (LTTB) series.
+
+Bucketed and fixed-size queries over long ranges read the sensor_rollups
+table (minute/hour/day aggregates kept current by the sensor_data_rollup
+trigger) instead of scanning raw readings; short ranges read sensor_data.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from downsample import lttb_select
+
+CRITERIA = ("temperature", "co2", "humidity", "sound")
+
+# `bucket` query values, their width, and the rollup they are built from
+BUCKETS = {
+    "1m": (timedelta(minutes=1), "minute"),
+    "5m": (timedelta(minutes=5), "minute"),
+    "1h": (timedelta(hours=1), "hour"),
+    "1d": (timedelta(days=1), "day"),
+}
+
+# Rollup resolutions, finest first
+ROLLUPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Span of a `points` query without start
+DEFAULT_POINTS_SPAN = timedelta(days=1)
+
+
+def local_naive(value: datetime) -> datetime:
+    """Timezone-aware datetimes as naive local time (sensor_data timestamps are local)."""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def query_span(start: Optional[datetime], end: Optional[datetime], default: timedelta) -> timedelta:
+    """Time range covered by start..end, with `default` when start is missing."""
+    if start is None:
+        return default
+    return local_naive(end) - local_naive(start) if end else datetime.now() - local_naive(start)
+
+
+# ============================================================
+# Raw rows and time buckets
+# ============================================================
+
+# Aggregate expressions per `agg` over raw readings ...
+RAW_AGGREGATES = {
+    "avg": """ROUND(AVG(temperature), 1) AS temperature, ROUND(AVG(co2))::int AS co2,
+              ROUND(AVG(humidity), 1) AS humidity, ROUND(AVG(sound), 1) AS sound""",
+    "min": "MIN(temperature) AS temperature, MIN(co2) AS co2, MIN(humidity) AS humidity, MIN(sound) AS sound",
+    "max": "MAX(temperature) AS temperature, MAX(co2) AS co2, MAX(humidity) AS humidity, MAX(sound) AS sound",
+}
+
+# ... and over rollup rows
+ROLLUP_AGGREGATES = {
+    "avg": ", ".join(
+        f"ROUND(SUM({c}_sum) / NULLIF(SUM({c}_count), 0){'' if c == 'co2' else ', 1'})"
+        f"{'::int' if c == 'co2' else ''} AS {c}"
+        for c in CRITERIA
+    ),
+    "min": ", ".join(f"MIN({c}_min) AS {c}" for c in CRITERIA),
+    "max": ", ".join(f"MAX({c}_max) AS {c}" for c in CRITERIA),
+}
+
+
+def time_filter(column: str, start: Optional[datetime], end: Optional[datetime],
+                widen: Optional[str] = None) -> tuple[str, list]:
+    """
+    WHERE clause fragment and params for the optional start/end filters.
+
+    With `widen` (an interval) rows starting up to that long before `start`
+    match too, so rollup buckets overlapping the start are included.
+    """
+    clause = ""
+    params = []
+    if start:
+        if widen:
+            clause += f" AND {column} > %s::timestamp - %s::interval"
+            params += [start, widen]
+        else:
+            clause += f" AND {column} >= %s"
+            params.append(start)
+    if end:
+        clause += f" AND {column} <= %s"
+        params.append(end)
+    return clause, params
+
+
+def series_query(room_id: int, start: Optional[datetime], end: Optional[datetime],
+                 bucket: Optional[str], agg: str, limit: int,
+                 rollup_min_span: Optional[timedelta] = None,
+                 before: Optional[tuple[datetime, int]] = None) -> tuple[str, list]:
+    """
+    Raw or bucketed sensor history query, most recent first.
+
+    Ranges of at least `rollup_min_span` (or without start, i.e. the whole
+    history) are read from the rollup the bucket width is built from; edge
+    buckets then include readings just outside start..end.
+
+    Raw rows are ordered by (timestamp, id); `before` (a decoded cursor)
+    continues after that key.
+    """
+    if bucket is None:
+        where, params = time_filter("timestamp", start, end)
+        if before:
+            # The plain bound lets newer partitions be pruned
+            where += " AND timestamp <= %s AND (timestamp, id) < (%s, %s)"
+            params += [before[0], *before]
+        query = f"""
+            SELECT id, room_id, timestamp, temperature, co2, humidity, sound
+            FROM sensor_data
+            WHERE room_id = %s{where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """
+        return query, [room_id, *params, limit]
+
+    width, rollup = BUCKETS[bucket]
+    span = query_span(start, end, default=timedelta.max)
+    interval = f"{int(width.total_seconds())} seconds"
+
+    if rollup_min_span is not None and span >= rollup_min_span:
+        where, params = time_filter("bucket", start, end, widen=f"1 {rollup}")
+        if agg == "last":
+            # Newest rollup bucket of each output bucket holds its last reading
+            query = f"""
+                SELECT DISTINCT ON (slot) last_id AS id, room_id, slot AS timestamp,
+                       temperature_last AS temperature, co2_last AS co2,
+                       humidity_last AS humidity, sound_last AS sound
+                FROM (
+                    SELECT *, date_bin(%s::interval, bucket, TIMESTAMP '2000-01-01') AS slot
+                    FROM sensor_rollups
+                    WHERE resolution = %s AND room_id = %s{where}
+                ) r
+                ORDER BY slot DESC, r.bucket DESC
+                LIMIT %s
+            """
+        else:
+            query = f"""
+                SELECT (array_agg(last_id ORDER BY bucket DESC))[1] AS id, room_id,
+                       date_bin(%s::interval, bucket, TIMESTAMP '2000-01-01') AS timestamp,
+                       {ROLLUP_AGGREGATES[agg]}
+                FROM sensor_rollups
+                WHERE resolution = %s AND room_id = %s{where}
+                GROUP BY room_id, 3
+                ORDER BY 3 DESC
+                LIMIT %s
+            """
+        return query, [interval, rollup, room_id, *params, limit]
+
+    where, params = time_filter("timestamp", start, end)
+    if agg == "last":
+        # Newest reading of each bucket, stamped with the bucket start
+        query = f"""
+            SELECT DISTINCT ON (bucket) id, room_id, bucket AS timestamp,
+                   temperature, co2, humidity, sound
+            FROM (
+                SELECT *, date_bin(%s::interval, timestamp, TIMESTAMP '2000-01-01') AS bucket
+                FROM sensor_data
+                WHERE room_id = %s{where}
+            ) s
+            ORDER BY bucket DESC, s.timestamp DESC, s.id DESC
+            LIMIT %s
+        """
+    else:
+        # id is the id of the newest reading in the bucket
+        query = f"""
+            SELECT (array_agg(id ORDER BY timestamp DESC, id DESC))[1] AS id, room_id,
+                   date_bin(%s::interval, timestamp, TIMESTAMP '2000-01-01') AS timestamp,
+                   {RAW_AGGREGATES[agg]}
+            FROM sensor_data
+            WHERE room_id = %s{where}
+            GROUP BY room_id, 3
+            ORDER BY 3 DESC
+            LIMIT %s
+        """
+    return query, [interval, room_id, *params, limit]
+
+
+# ============================================================
+# Fixed-size series (regular grid + LTTB)
+# ============================================================
+
+# Grid bounds: start and end, by default the last day
+GRID_HI = "COALESCE(%(end)s::timestamp, LOCALTIMESTAMP)"
+GRID_LO = f"COALESCE(%(start)s::timestamp, {GRID_HI} - INTERVAL '1 day')"
+
+# Grid between the bounds split into `slots` equal slots; the readings CTE
+# yields (slot, id, <criterion>_sum, <criterion>_count) rows and every slot
+# comes back, empty ones included.
+GRID_QUERY = """
+    WITH bounds AS (
+        SELECT lo, hi, NULLIF(GREATEST(EXTRACT(EPOCH FROM hi - lo), 0), 0) / %(slots)s AS width
+        FROM (SELECT {hi} AS hi, {lo} AS lo) b
+    ),
+    readings AS ({readings})
+    SELECT g.slot,
+           b.lo + make_interval(secs => g.slot * COALESCE(b.width, 0)) AS timestamp,
+           MAX(r.id) AS id,
+           {averages}
+    FROM bounds b
+    CROSS JOIN generate_series(0, %(slots)s - 1) AS g(slot)
+    LEFT JOIN readings r ON r.slot = g.slot
+    GROUP BY g.slot, b.lo, b.width
+    ORDER BY g.slot
+"""
+
+GRID_AVERAGES = ",\n           ".join(
+    f"(SUM(r.{c}_sum) / NULLIF(SUM(r.{c}_count), 0))::float AS {c}" for c in CRITERIA
+)
+
+# The bounds are repeated as plain expressions so that sensor_data
+# partitions outside them are pruned when the query starts
+GRID_RAW_READINGS = """
+        SELECT LEAST(FLOOR(EXTRACT(EPOCH FROM s.timestamp - b.lo) / b.width)::int, %(slots)s - 1) AS slot,
+               s.id, {columns}
+        FROM sensor_data s, bounds b
+        WHERE s.room_id = %(room_id)s AND s.timestamp >= {lo} AND s.timestamp <= {hi}
+""".format(columns=", ".join(f"s.{c} AS {c}_sum, ({c} IS NOT NULL)::int AS {c}_count" for c in CRITERIA),
+           lo=GRID_LO, hi=GRID_HI)
+
+GRID_ROLLUP_READINGS = """
+        SELECT GREATEST(LEAST(FLOOR(EXTRACT(EPOCH FROM r.bucket - b.lo) / b.width)::int, %(slots)s - 1), 0) AS slot,
+               r.last_id AS id, {columns}
+        FROM sensor_rollups r, bounds b
+        WHERE r.resolution = %(resolution)s AND r.room_id = %(room_id)s
+          AND r.bucket >= date_trunc(%(resolution)s, b.lo) AND r.bucket <= b.hi
+""".format(columns=", ".join(f"r.{c}_sum, r.{c}_count" for c in CRITERIA))
+
+
+def grid_query(room_id: int, start: Optional[datetime], end: Optional[datetime], points: int,
+               resolution: int, rollup_min_span: Optional[timedelta] = None) -> tuple[str, dict]:
+    """
+    Grid query for a `points` series with `resolution` slots per point.
+
+    Spans of at least `rollup_min_span` read the coarsest rollup no wider
+    than a slot, with fewer slots if needed so that no slot is narrower than
+    a rollup bucket (an empty slot would come back as a gap). Spans too
+    short to give every point a minute bucket read sensor_data instead.
+    """
+    slots = points * resolution
+    params = {"room_id": room_id, "start": start, "end": end, "slots": slots}
+    span = query_span(start, end, default=DEFAULT_POINTS_SPAN)
+
+    if rollup_min_span is None or span < rollup_min_span or span < points * ROLLUPS["minute"]:
+        return GRID_QUERY.format(readings=GRID_RAW_READINGS, averages=GRID_AVERAGES, lo=GRID_LO, hi=GRID_HI), params
+
+    slot_width = span / slots
+    rollup = "minute"
+    for name, width in ROLLUPS.items():
+        if width <= slot_width:
+            rollup = name
+    params["resolution"] = rollup
+    params["slots"] = min(slots, span // ROLLUPS[rollup])
+    return GRID_QUERY.format(readings=GRID_ROLLUP_READINGS, averages=GRID_AVERAGES, lo=GRID_LO, hi=GRID_HI), params
+
+
+def downsample_grid(room_id: int, slots: list[dict], points: int) -> list[dict]:
+    """
+    Reduce grid slots to `points` rows (most recent first) with lttb_select.
+
+    Buckets without readings become gap rows: id 0, all readings null,
+    stamped with the bucket start.
+    """
+    samples = [
+        tuple(slot[c] for c in CRITERIA) if slot["id"] is not None else None
+        for slot in slots
+    ]
+
+    data = []
+    for bucket, chosen in enumerate(lttb_select(samples, points)):
+        if chosen is None:
+            first = slots[bucket * len(slots) // points]
+            data.append({"id": 0, "room_id": room_id, "timestamp": first["timestamp"],
+                         "temperature": None, "co2": None, "humidity": None, "sound": None})
+            continue
+        slot = slots[chosen]
+        data.append({
+            "id": slot["id"],
+            "room_id": room_id,
+            "timestamp": slot["timestamp"],
+            "temperature": round(slot["temperature"], 1) if slot["temperature"] is not None else None,
+            "co2": round(slot["co2"]) if slot["co2"] is not None else None,
+            "humidity": round(slot["humidity"], 1) if slot["humidity"] is not None else None,
+            "sound": round(slot["sound"], 1) if slot["sound"] is not None else None,
+        })
+
+    data.reverse()
+    return data
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Sensor Ingest
+Validation and COPY encoding shared by the sensor_data write paths.
+
+Readings are checked against the valid_* CHECK constraints of sensor_data
+(and the known room ids) before they are written, so a bad reading is
+rejected on its own instead of aborting the COPY of a whole batch. Accepted
+readings are encoded straight to COPY text format.
+
+Rollups (sensor_data_rollup trigger) and the API's latest-reading cache and
+live stream (sensor_data_notify -> sensor feed) follow from the COPY itself.
+"""
+
+import math
+from datetime import datetime
+from typing import Container, Iterable, Mapping, Optional
+
+from history import local_naive
+
+# Same bounds as the valid_* CHECK constraints in database/schema.sql
+CHECK_RANGES = {
+    "temperature": (-10, 50),
+    "co2": (300, 5000),
+    "humidity": (0, 100),
+    "sound": (0, 130),
+}
+
+COPY_SQL = "COPY sensor_data (room_id, timestamp, temperature, co2, humidity, sound) FROM STDIN"
+NULL = "\\N"  # COPY text format
+
+# (room_id, timestamp, temperature, co2, humidity, sound)
+Row = tuple[int, datetime, Optional[float], Optional[int], Optional[float], Optional[float]]
+
+
+def reading_errors(reading: Mapping, room_ids: Container[int]) -> list[str]:
+    """Reasons a reading would be refused by the database (empty if none)."""
+    errors = []
+    room_id = reading.get("room_id")
+    if room_id not in room_ids:
+        errors.append(f"unknown room_id {room_id}")
+    for criterion, (low, high) in CHECK_RANGES.items():
+        value = reading.get(criterion)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{criterion} must be a number")
+        elif not low <= value <= high:  # also false for NaN
+            errors.append(f"{criterion} {value} outside {low}..{high}")
+        elif criterion == "co2" and value != math.floor(value):
+            errors.append("co2 must be an integer")
+    timestamp = reading.get("timestamp")
+    if timestamp is not None and not isinstance(timestamp, datetime):
+        errors.append("timestamp must be a datetime")
+    return errors
+
+
+def validate(readings: Iterable[Mapping], room_ids: Container[int],
+             now: Optional[datetime] = None) -> tuple[list[Row], list[dict]]:
+    """
+    Split readings into rows to write and rejects.
+
+    Readings are mappings with room_id, an optional timestamp (default:
+    `now`, local time) and optional criterion values. Rejects are
+    {"index": position in `readings`, "errors": [...]}.
+    """
+    now = now or datetime.now()
+    t_low, t_high = CHECK_RANGES["temperature"]
+    c_low, c_high = CHECK_RANGES["co2"]
+    h_low, h_high = CHECK_RANGES["humidity"]
+    s_low, s_high = CHECK_RANGES["sound"]
+    rows = []
+    rejects = []
+    for index, reading in enumerate(readings):
+        get = reading.get
+        room_id = get("room_id")
+        timestamp = get("timestamp")
+        temperature = get("temperature")
+        co2 = get("co2")
+        humidity = get("humidity")
+        sound = get("sound")
+        # Inline checks for the common all-valid case; reading_errors()
+        # only runs to explain a failure (and has the final say)
+        try:
+            valid = (
+                room_id in room_ids
+                and (temperature is None or t_low <= temperature <= t_high)
+                and (co2 is None or (c_low <= co2 <= c_high and co2 == int(co2)))
+                and (humidity is None or h_low <= humidity <= h_high)
+                and (sound is None or s_low <= sound <= s_high)
+                and (timestamp is None or isinstance(timestamp, datetime))
+            )
+        except (TypeError, ValueError):
+            valid = False
+        if not valid or bool in (type(temperature), type(co2), type(humidity), type(sound)):
+            errors = reading_errors(reading, room_ids)
+            if errors:
+                rejects.append({"index": index, "errors": errors})
+                continue
+        rows.append((
+            room_id,
+            local_naive(timestamp) if timestamp is not None else now,
+            temperature,
+            int(co2) if co2 is not None else None,
+            humidity,
+            sound,
+        ))
+    return rows, rejects
+
+
+def encode_copy(rows: Iterable[Row]) -> bytes:
+    """COPY text-format data for validated rows."""
+    lines = []
+    for room_id, timestamp, temperature, co2, humidity, sound in rows:
+        lines.append(
+            f"{room_id}\t{timestamp.isoformat()}"
+            f"\t{temperature if temperature is not None else NULL}"
+            f"\t{co2 if co2 is not None else NULL}"
+            f"\t{humidity if humidity is not None else NULL}"
+            f"\t{sound if sound is not None else NULL}\n"
+        )
+    return "".join(lines).encode()
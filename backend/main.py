@@ -4,29 +4,172 @@ ComfortRoom REST API
 FastAPI backend for IoT Room Selection Decision Support System
 """
 
-from datetime import datetime
-from typing import Optional
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
-from decision import Weights, DesiredProfile, rank_rooms
+import numpy as np
+import psycopg
+
+from cache import DataVersions, LatestReadingCache, RecommendationCache
+from catalog import RoomCatalog
+from conditional import conditional, make_etag
+from db import Database, PoolTimeout
+from decision import Weights, DesiredProfile, rank_rooms_arrays, rank_rooms_batch
+from export import MEDIA_TYPES, export_chunks
+from fastjson import fast_json
+from feed import SensorFeed
+from history import downsample_grid, grid_query, local_naive, series_query
+from ingest import COPY_SQL, encode_copy, validate
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from partitions import PartitionMaintainer
+from recent import RecentHistory
+from stream import SensorBroadcaster, encode_dropped, encode_row
 
 # Database configuration (same as simulator.py)
 DB_CONFIG = {
     "host": "localhost",
-    "database": "comfortroom_db",
+    "dbname": "comfortroom_db",
     "user": "comfortroom",
     "password": "comfortroom",
 }
 
+# Connection pool sizing. Endpoints are async, so concurrency is bounded by
+# POOL_MAX_SIZE connections; further requests wait up to POOL_TIMEOUT seconds
+# for one before getting a 503.
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 20
+POOL_TIMEOUT = 5.0            # seconds to wait for a free connection
+POOL_CHECK_INTERVAL = 30.0    # seconds between health checks of idle connections
+
+# Latest readings are pushed into the cache by the sensor feed; entries older
+# than this many seconds are re-read from the database (10x INSERT_INTERVAL).
+LATEST_CACHE_MAX_AGE = 30.0
+
+# The room catalog is reloaded when the rooms table changes (NOTIFY from the
+# rooms_version trigger); its version counter is also re-checked this often.
+CATALOG_CHECK_INTERVAL = 60.0
+
+# /api/recommend results are cached per normalized request until the next
+# sensor batch arrives. Weights are rounded to RECOMMEND_CACHE_WEIGHT_DIGITS
+# decimals and desired values to RECOMMEND_CACHE_PROFILE_DIGITS before
+# scoring, so near-identical requests share an entry.
+RECOMMEND_CACHE_SIZE = 1024
+RECOMMEND_CACHE_WEIGHT_DIGITS = 2
+RECOMMEND_CACHE_PROFILE_DIGITS = 1
+
+# /api/recommend/batch accepts up to this many requests per call and scores
+# them in chunks of RECOMMEND_BATCH_CHUNK (rooms x chunk floats per matrix),
+# in a worker thread. Encoding the result holds the GIL, ~1 us per ranked
+# room, so a call may return at most RECOMMEND_BATCH_MAX_ROWS of them in
+# total (e.g. 10000 requests with limit=20); larger batches get a 400.
+RECOMMEND_BATCH_MAX_REQUESTS = 10000
+RECOMMEND_BATCH_CHUNK = 1024
+RECOMMEND_BATCH_MAX_ROWS = 200000
+
+# /api/sensors/{room_id}: grid slots per output point when `points` asks for
+# an LTTB-reduced series, and the span from which bucketed and `points`
+# queries read the minute/hour/day rollups instead of raw readings.
+SENSOR_POINTS_RESOLUTION = 8
+SENSOR_ROLLUP_MIN_SPAN = timedelta(hours=3)
+
+# sensor_data is partitioned by day. Queries for the newest readings first
+# look at this window only (the newest partitions) and search the whole
+# table just for rooms it does not answer; the sensor feed and stream
+# replays only follow rows stamped within it. Partitions are created this many
+# days ahead, on startup and every SENSOR_PARTITION_INTERVAL seconds.
+SENSOR_RECENT_WINDOW = timedelta(days=1)
+SENSOR_PARTITION_DAYS_AHEAD = 2
+SENSOR_PARTITION_INTERVAL = 3600.0
+
+# /api/sensors/{room_id} answers raw history within this horizon from
+# in-memory per-room arrays (see recent.py; ~37.5 KiB per room per hour at
+# one reading every 3 s). Must not exceed SENSOR_RECENT_WINDOW, which bounds
+# what the sensor feed delivers. The arrays are only used while the feed
+# is connected and has polled within SENSOR_HISTORY_MAX_LAG seconds (it
+# polls every SENSOR_FEED_POLL_INTERVAL seconds without notifications);
+# otherwise requests read the database.
+SENSOR_HISTORY_HORIZON = timedelta(hours=6)
+SENSOR_HISTORY_MAX_LAG = 5.0
+SENSOR_FEED_POLL_INTERVAL = 2.0
+
+# /api/stream/sensors: frames buffered per client before the oldest are
+# dropped, seconds between keepalive comments, and rows replayed to a client
+# reconnecting with Last-Event-ID.
+STREAM_QUEUE_SIZE = 1000
+STREAM_KEEPALIVE = 15.0
+STREAM_REPLAY_LIMIT = 1000
+
+# /api/export/sensors: bytes per response chunk, and exports running at once
+# (each holds a pool connection until it is done; more get a 503)
+EXPORT_CHUNK_SIZE = 256 * 1024
+EXPORT_MAX_CONCURRENT = 4
+
+# Cache-Control of the GET endpoints that answer conditional requests
+# (ETag / Last-Modified, 304 when unchanged). Rooms and calendars change
+# rarely and may be reused for a minute; latest readings change every few
+# seconds, so clients revalidate every time (cheap: no query on a 304).
+ROOMS_CACHE_CONTROL = "public, max-age=60"
+CALENDAR_CACHE_CONTROL = "public, max-age=60"
+LATEST_CACHE_CONTROL = "no-cache"
+
+# POST /api/sensors/batch accepts up to this many readings per call; they
+# are written with a single COPY in one transaction.
+SENSOR_BATCH_MAX_READINGS = 100000
+
+db_pool = Database(
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    timeout=POOL_TIMEOUT,
+    check_interval=POOL_CHECK_INTERVAL,
+    **DB_CONFIG,
+)
+
+latest_cache = LatestReadingCache(max_age=LATEST_CACHE_MAX_AGE)
+room_catalog = RoomCatalog(db_pool, check_interval=CATALOG_CHECK_INTERVAL)
+data_versions = DataVersions(db_pool, check_interval=CATALOG_CHECK_INTERVAL)
+recommendation_cache = RecommendationCache(max_entries=RECOMMEND_CACHE_SIZE, max_age=LATEST_CACHE_MAX_AGE)
+sensor_feed = SensorFeed(DB_CONFIG, window=SENSOR_RECENT_WINDOW, poll_interval=SENSOR_FEED_POLL_INTERVAL)
+sensor_broadcaster = SensorBroadcaster(max_queue=STREAM_QUEUE_SIZE, feed=sensor_feed)
+recent_history = RecentHistory(db_pool, horizon=SENSOR_HISTORY_HORIZON,
+                               feed=sensor_feed, max_lag=SENSOR_HISTORY_MAX_LAG)
+export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+partition_maintainer = PartitionMaintainer(
+    db_pool, days_ahead=SENSOR_PARTITION_DAYS_AHEAD, interval=SENSOR_PARTITION_INTERVAL
+)
+
+sensor_feed.subscribe(latest_cache.update)
+sensor_feed.subscribe(recent_history.update)
+sensor_feed.subscribe(recommendation_cache.new_epoch)
+sensor_feed.subscribe(sensor_broadcaster.publish)
+sensor_feed.watch("data_versions", room_catalog.invalidate)
+sensor_feed.watch("data_versions", data_versions.invalidate)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the connection pool, load the room catalog and start the background tasks."""
+    await db_pool.open()
+    await room_catalog.rooms()
+    partition_maintainer.start()
+    sensor_feed.start()
+    yield
+    await sensor_feed.stop()
+    await partition_maintainer.stop()
+    await db_pool.close()
+
+
 app = FastAPI(
     title="ComfortRoom API",
     description="IoT Room Selection Decision Support System - REST API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Enable CORS for frontend access
@@ -36,6 +179,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -104,6 +248,35 @@ class RecommendationRequest(BaseModel):
     desired_profile: Optional[DesiredProfileRequest] = Field(default=None, description="User's desired ideal values")
 
 
+class RecommendationBatchRequest(BaseModel):
+    requests: list[RecommendationRequest] = Field(..., min_length=1, max_length=RECOMMEND_BATCH_MAX_REQUESTS)
+
+
+# Request/Response models for bulk sensor ingest
+class SensorReadingIn(BaseModel):
+    """One reading to store; values are range-checked per reading, not by the schema."""
+    room_id: int
+    timestamp: Optional[datetime] = Field(default=None, description="Reading time (default: now)")
+    temperature: Optional[float] = None
+    co2: Optional[float] = Field(default=None, description="CO2 in ppm (whole number)")
+    humidity: Optional[float] = None
+    sound: Optional[float] = None
+
+
+class SensorBatchRequest(BaseModel):
+    readings: list[SensorReadingIn] = Field(..., min_length=1, max_length=SENSOR_BATCH_MAX_READINGS)
+
+
+class RejectedReading(BaseModel):
+    index: int
+    errors: list[str]
+
+
+class SensorBatchResult(BaseModel):
+    accepted: int
+    rejected: list[RejectedReading]
+
+
 class RoomScore(BaseModel):
     """Individual room score in recommendation results."""
     room_id: int
@@ -115,9 +288,146 @@ class RoomScore(BaseModel):
     facilities: dict
 
 
-def get_db_connection():
-    """Create database connection with dictionary cursor."""
-    return psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Report pool exhaustion as a temporary condition rather than a server error."""
+    return JSONResponse(status_code=503, content={"detail": f"Database busy: {exc}"})
+
+
+def normalize_recommendation_request(request: RecommendationRequest) -> RecommendationRequest:
+    """
+    Round weights and desired values to the recommendation cache precision.
+
+    Requirements are exact already; False and None both mean "not needed".
+    """
+    weights = request.weights
+    profile = request.desired_profile
+    req = request.requirements
+
+    def quantize(value, digits):
+        return round(value, digits) if value is not None else None
+
+    return RecommendationRequest(
+        weights=RecommendationWeights(
+            temperature=quantize(weights.temperature, RECOMMEND_CACHE_WEIGHT_DIGITS),
+            co2=quantize(weights.co2, RECOMMEND_CACHE_WEIGHT_DIGITS),
+            humidity=quantize(weights.humidity, RECOMMEND_CACHE_WEIGHT_DIGITS),
+            sound=quantize(weights.sound, RECOMMEND_CACHE_WEIGHT_DIGITS),
+        ),
+        requirements=RoomRequirements(
+            min_capacity=req.min_capacity,
+            needs_projector=req.needs_projector or None,
+            needs_whiteboard=req.needs_whiteboard or None,
+            needs_accessible=req.needs_accessible or None,
+            min_power_outlets=req.min_power_outlets,
+        ),
+        desired_profile=DesiredProfileRequest(
+            temperature=quantize(profile.temperature, RECOMMEND_CACHE_PROFILE_DIGITS),
+            co2=profile.co2,
+            humidity=quantize(profile.humidity, RECOMMEND_CACHE_PROFILE_DIGITS),
+            sound=quantize(profile.sound, RECOMMEND_CACHE_PROFILE_DIGITS),
+        ) if profile else None,
+    )
+
+
+def recommendation_cache_key(request: RecommendationRequest) -> tuple:
+    """Hashable key for a normalized request."""
+    weights = request.weights
+    req = request.requirements
+    profile = request.desired_profile
+    return (
+        (weights.temperature, weights.co2, weights.humidity, weights.sound),
+        (req.min_capacity, req.needs_projector, req.needs_whiteboard,
+         req.needs_accessible, req.min_power_outlets),
+        (profile.temperature, profile.co2, profile.humidity, profile.sound) if profile else None,
+    )
+
+
+async def get_latest_readings(room_ids: list[int]) -> dict[int, Optional[dict]]:
+    """
+    Get the newest sensor reading for each room.
+
+    Served from the latest-reading cache; rooms that miss are loaded with a
+    single query and written back. Rooms without data map to None.
+    """
+    readings, missing = latest_cache.get_many(room_ids)
+    if not missing:
+        return readings
+
+    async with db_pool.connection() as conn, conn.cursor() as cur:
+        # Recent readings first (partition-pruned), then the whole table
+        # for rooms that had none
+        recent = datetime.now() - SENSOR_RECENT_WINDOW
+        for window, params in (("AND timestamp >= %s", [recent]), ("", [])):
+            await cur.execute(f"""
+                SELECT s.id, r.room_id, s.timestamp, s.temperature, s.co2, s.humidity, s.sound
+                FROM unnest(%s::int[]) AS r(room_id)
+                LEFT JOIN LATERAL (
+                    SELECT id, timestamp, temperature, co2, humidity, sound
+                    FROM sensor_data
+                    WHERE room_id = r.room_id {window}
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                ) s ON TRUE
+            """, (missing, *params))
+            missing = []
+            for row in await cur.fetchall():
+                if row["id"] is None:
+                    missing.append(row["room_id"])
+                    continue
+                readings[row["room_id"]] = latest_cache.put(row["room_id"], row)
+            if not missing:
+                break
+
+    for room_id in missing:
+        readings[room_id] = latest_cache.put(room_id, None)
+
+    return readings
+
+
+def decision_inputs(request: RecommendationRequest) -> tuple[Weights, Optional[DesiredProfile]]:
+    """Convert request weights and desired profile to decision module types."""
+    weights = Weights(
+        temperature=request.weights.temperature,
+        co2=request.weights.co2,
+        humidity=request.weights.humidity,
+        sound=request.weights.sound,
+    )
+
+    desired_profile = None
+    if request.desired_profile:
+        desired_profile = DesiredProfile(
+            temperature=request.desired_profile.temperature,
+            co2=request.desired_profile.co2,
+            humidity=request.desired_profile.humidity,
+            sound=request.desired_profile.sound,
+        )
+
+    return weights, desired_profile
+
+
+def sensor_columns(rooms: list[dict], readings: dict[int, Optional[dict]]) -> dict[str, np.ndarray]:
+    """One array per criterion aligned with `rooms`, NaN where a room has no reading."""
+    columns = {criterion: [] for criterion in ("temperature", "co2", "humidity", "sound")}
+    for room in rooms:
+        sensor_data = readings.get(room["id"])
+        for criterion, values in columns.items():
+            value = sensor_data[criterion] if sensor_data else None
+            values.append(float(value) if value else math.nan)
+    return {criterion: np.array(values) for criterion, values in columns.items()}
+
+
+def room_facilities(room: dict) -> dict:
+    """Facilities block of a recommendation result."""
+    return {
+        "building": room["building"],
+        "floor": room["floor"],
+        "capacity": room["capacity"],
+        "has_projector": room["has_projector"],
+        "has_whiteboard": room["has_whiteboard"],
+        "has_power_outlets": room["has_power_outlets"],
+        "is_accessible": room["is_accessible"],
+    }
 
 
 # ============================================================
@@ -125,7 +435,7 @@ def get_db_connection():
 # ============================================================
 
 @app.get("/")
-def root():
+async def root():
     """API root - welcome message."""
     return {
         "message": "ComfortRoom API",
@@ -134,202 +444,448 @@ def root():
     }
 
 
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Get connection pool, sensor feed, cache and room catalog statistics.
+
+    A growing `pool.waiting` or `pool.timeouts` means POOL_MAX_SIZE is too small
+    for the request concurrency.
+    """
+    return {
+        "pool": db_pool.stats(),
+        "sensor_feed": sensor_feed.stats(),
+        "latest_cache": latest_cache.stats(),
+        "recent_history": recent_history.stats(),
+        "room_catalog": room_catalog.stats(),
+        "data_versions": data_versions.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "sensor_stream": sensor_broadcaster.stats(),
+        "partitions": partition_maintainer.stats(),
+    }
+
+
 @app.get("/api/rooms", response_model=list[Room])
-def get_rooms():
+async def get_rooms(request: Request, response: Response):
     """
     Get all rooms.
 
-    Returns a list of all rooms with their facilities.
+    Returns a list of all rooms with their facilities. The ETag is the room
+    catalog version; If-None-Match with it returns 304.
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, name, building, floor, capacity,
-                       has_projector, has_whiteboard, has_power_outlets, is_accessible
-                FROM rooms
-                ORDER BY name
-            """)
-            rooms = cur.fetchall()
-        conn.close()
-        return rooms
-    except psycopg2.Error as e:
+        rooms = await room_catalog.rooms()
+        if room_catalog.version is not None:
+            not_modified = conditional(request, response, make_etag("rooms", room_catalog.version),
+                                       ROOMS_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+        return fast_json(rooms, response)
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/rooms/{room_id}", response_model=Room)
-def get_room(room_id: int):
+async def get_room(room_id: int, request: Request, response: Response):
     """
     Get a specific room by ID.
 
-    Returns room details including all facilities.
+    Returns room details including all facilities. Conditional like /api/rooms.
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, name, building, floor, capacity,
-                       has_projector, has_whiteboard, has_power_outlets, is_accessible
-                FROM rooms
-                WHERE id = %s
-            """, (room_id,))
-            room = cur.fetchone()
-        conn.close()
+        room = await room_catalog.get(room_id)
 
         if not room:
             raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
-        return room
-    except psycopg2.Error as e:
+        if room_catalog.version is not None:
+            not_modified = conditional(request, response, make_etag("room", room_id, room_catalog.version),
+                                       ROOMS_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+        return fast_json(room, response)
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/sensors/{room_id}", response_model=list[SensorData])
-def get_sensor_data(
+async def get_sensor_data(
     room_id: int,
+    response: Response,
     start: Optional[datetime] = Query(None, description="Start time filter (ISO format)"),
     end: Optional[datetime] = Query(None, description="End time filter (ISO format)"),
     limit: int = Query(100, ge=1, le=1000, description="Max number of records to return"),
+    bucket: Optional[Literal["1m", "5m", "1h", "1d"]] = Query(None, description="Aggregate readings per time bucket"),
+    agg: Optional[Literal["avg", "min", "max", "last"]] = Query(None, description="Bucket aggregate (default avg)"),
+    points: Optional[int] = Query(None, ge=2, le=1000, description="Return a fixed-size LTTB-reduced series"),
+    cursor: Optional[str] = Query(None, description="Continue after a previous page (X-Next-Cursor header)"),
 ):
     """
     Get sensor data for a specific room.
 
     Supports optional time range filtering with `start` and `end` query parameters.
     Returns most recent data first.
+
+    Raw rows are paged by keyset: a full page carries an X-Next-Cursor
+    header, and passing it back as `cursor` returns the next `limit` rows.
+
+    Raw rows within the last SENSOR_HISTORY_HORIZON are served from memory;
+    only requests reaching further back query the database.
+
+    Downsampling, computed in the database:
+    - bucket/agg: one row per time bucket with the avg, min, max or last
+      reading; `id` is the id of the newest reading, `limit` counts buckets
+    - points: exactly N rows covering start..end (default: the last day),
+      picked by LTTB from a regular grid; stretches without readings come
+      back as gap rows with id 0 and null readings
+
+    Both read the minute/hour/day rollups for spans of SENSOR_ROLLUP_MIN_SPAN
+    or more.
     """
+    if points is not None and bucket is not None:
+        raise HTTPException(status_code=400, detail="Use either bucket or points, not both")
+    if agg is not None and bucket is None:
+        raise HTTPException(status_code=400, detail="agg requires bucket")
+    if start and end and local_naive(start) >= local_naive(end):
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if cursor is not None and (bucket is not None or points is not None):
+        raise HTTPException(status_code=400, detail="cursor only pages raw readings")
     try:
-        conn = get_db_connection()
-
-        # First verify room exists
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM rooms WHERE id = %s", (room_id,))
-            if not cur.fetchone():
-                conn.close()
-                raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
-
-        # Build query with optional time filters
-        query = """
-            SELECT id, room_id, timestamp, temperature, co2, humidity, sound
-            FROM sensor_data
-            WHERE room_id = %s
-        """
-        params = [room_id]
-
-        if start:
-            query += " AND timestamp >= %s"
-            params.append(start)
-        if end:
-            query += " AND timestamp <= %s"
-            params.append(end)
-
-        query += " ORDER BY timestamp DESC LIMIT %s"
-        params.append(limit)
+        before = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Existence check against the room catalog, so an empty result below means "no data"
+        if not await room_catalog.get(room_id):
+            raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
+
+        data = None
+        if bucket is None and points is None:
+            data = await recent_history.get(room_id, start, end, limit, before)
+
+        if data is None:
+            async with db_pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    if points is not None:
+                        query, params = grid_query(room_id, start, end, points, SENSOR_POINTS_RESOLUTION,
+                                                   rollup_min_span=SENSOR_ROLLUP_MIN_SPAN)
+                        await cur.execute(query, params)
+                        return fast_json(downsample_grid(room_id, await cur.fetchall(), points), response)
+
+                    data = None
+                    if bucket is None and start is None and before is None:
+                        # Newest rows: usually all within SENSOR_RECENT_WINDOW,
+                        # which only touches the newest partitions
+                        query, params = series_query(room_id, datetime.now() - SENSOR_RECENT_WINDOW, end,
+                                                     None, "avg", limit)
+                        await cur.execute(query, params)
+                        data = await cur.fetchall()
+                        if len(data) < limit:
+                            data = None
+
+                    if data is None:
+                        query, params = series_query(room_id, start, end, bucket, agg or "avg", limit,
+                                                     rollup_min_span=SENSOR_ROLLUP_MIN_SPAN, before=before)
+                        await cur.execute(query, params)
+                        data = await cur.fetchall()
+
+        if bucket is None and len(data) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(data[-1]["timestamp"], data[-1]["id"])
+        return fast_json(data, response)
+    except psycopg.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            data = cur.fetchall()
-        conn.close()
 
-        return data
-    except psycopg2.Error as e:
+@app.get("/api/stream/sensors")
+async def stream_sensor_data(
+    request: Request,
+    room_id: Optional[list[int]] = Query(None, description="Rooms to follow (repeat for several); all rooms if omitted"),
+    last_id: Optional[int] = Query(None, ge=0, description="Also send rows with a higher id (like Last-Event-ID)"),
+):
+    """
+    Stream new sensor readings as Server-Sent Events.
+
+    Each `reading` event carries one row in the SensorData shape. Events
+    come in commit order, not id order: a late commit can arrive after rows
+    with higher ids. The event id is a resume position (see stream.py), and
+    browsers reconnecting with Last-Event-ID get the rows they missed
+    replayed (up to STREAM_REPLAY_LIMIT), plus some they already have; skip
+    those by their `id`. `last_id` does the same for the first connection.
+    To follow on from a history load, open the stream first and load the
+    history once it is open.
+
+    A `dropped` event means the client fell behind and readings were
+    skipped; reload the history to fill the gap.
+    """
+    room_ids = None
+    if room_id:
+        room_ids = set(room_id)
+        for rid in room_ids:
+            if await room_catalog.get(rid) is None:
+                raise HTTPException(status_code=404, detail=f"Room {rid} not found")
+
+    # Subscribe before the replay query so no row falls in between; rows
+    # delivered by both are skipped by id. Every row at or below the feed's
+    # settled id now was delivered before, so the replay read has it.
+    subscription = sensor_broadcaster.subscribe(room_ids)
+    settled_id = sensor_feed.settled_id
+    replay = []
+    try:
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            last_id = int(last_event_id)
+        if last_id is not None:
+            async with db_pool.connection() as conn:
+                cur = await conn.execute("""
+                    SELECT id, room_id, timestamp, temperature, co2, humidity, sound
+                    FROM sensor_data
+                    WHERE id > %s AND timestamp >= %s AND (%s::int[] IS NULL OR room_id = ANY(%s::int[]))
+                    ORDER BY id DESC
+                    LIMIT %s
+                """, (last_id, datetime.now() - SENSOR_RECENT_WINDOW,
+                      list(room_ids) if room_ids else None,
+                      list(room_ids) if room_ids else None, STREAM_REPLAY_LIMIT + 1))
+                replay = (await cur.fetchall())[::-1]
+    except psycopg.Error as e:
+        sensor_broadcaster.unsubscribe(subscription)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except BaseException:
+        sensor_broadcaster.unsubscribe(subscription)
+        raise
+
+    async def events():
+        try:
+            head = [f"retry: {int(STREAM_KEEPALIVE * 1000)}\n\n".encode()]
+            if len(replay) > STREAM_REPLAY_LIMIT:
+                head.append(encode_dropped(None))
+                del replay[0]
+            for row in replay:
+                # Rows below this one were sent just before it, rows above
+                # settled_id will be (by the replay or the feed)
+                head.append(encode_row(row, min(row["id"], settled_id)))
+                if row["id"] > settled_id:  # may still be queued by the feed
+                    subscription.replayed.add(row["id"])
+            yield b"".join(head)
+
+            while True:
+                frames = await subscription.next_frames(STREAM_KEEPALIVE)
+                if frames is None:
+                    yield b": keepalive\n\n"
+                elif frames:
+                    yield frames
+        finally:
+            sensor_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/export/sensors")
+async def export_sensor_data(
+    room_id: Optional[list[int]] = Query(None, description="Rooms to export (repeat for several); all rooms if omitted"),
+    start: Optional[datetime] = Query(None, description="Start time filter (ISO format)"),
+    end: Optional[datetime] = Query(None, description="End time filter (ISO format)"),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="Output format"),
+):
+    """
+    Export raw sensor readings as a streamed CSV or NDJSON download.
+
+    Rows come straight from COPY in EXPORT_CHUNK_SIZE chunks, room by room
+    and ordered by (timestamp, id) within a room, so memory use does not
+    grow with the range. At most EXPORT_MAX_CONCURRENT exports run at once.
+    """
+    if start and end and local_naive(start) >= local_naive(end):
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if export_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many exports running, retry later")
+
+    try:
+        known = {room["id"] for room in await room_catalog.rooms()}
+    except psycopg.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if room_id is None:
+        room_ids = sorted(known)
+    else:
+        room_ids = list(dict.fromkeys(room_id))
+        missing = [r for r in room_ids if r not in known]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Rooms not found: {missing}")
+
+    async def chunks():
+        async with export_slots, db_pool.connection() as conn:
+            async for chunk in export_chunks(conn, fmt, room_ids, start, end, EXPORT_CHUNK_SIZE):
+                yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="sensor_data.{fmt}"'},
+    )
 
 
 @app.get("/api/calendar/{room_id}", response_model=list[CalendarEvent])
-def get_calendar_events(
+async def get_calendar_events(
     room_id: int,
+    request: Request,
+    response: Response,
     start: Optional[datetime] = Query(None, description="Start time filter (ISO format)"),
     end: Optional[datetime] = Query(None, description="End time filter (ISO format)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Max number of events per page"),
+    cursor: Optional[str] = Query(None, description="Continue after a previous page (X-Next-Cursor header)"),
 ):
     """
     Get calendar events for a specific room.
 
     Supports optional time range filtering. By default returns events from today onwards.
+
+    With `limit`, events are paged by keyset: a full page carries an
+    X-Next-Cursor header to pass back as `cursor`.
+
+    The ETag follows the calendar_events change counter (and the day, for
+    the default range); If-None-Match with it returns 304 without a query.
     """
     try:
-        conn = get_db_connection()
-
-        # First verify room exists
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM rooms WHERE id = %s", (room_id,))
-            if not cur.fetchone():
-                conn.close()
-                raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
-
-        # Build query with optional time filters
-        query = """
-            SELECT id, room_id, title, start_time, end_time, organizer
-            FROM calendar_events
-            WHERE room_id = %s
-        """
-        params = [room_id]
-
-        if start:
-            query += " AND start_time >= %s"
-            params.append(start)
-        else:
-            # Default: from start of today
-            query += " AND start_time >= CURRENT_DATE"
-
-        if end:
-            query += " AND end_time <= %s"
-            params.append(end)
-
-        query += " ORDER BY start_time ASC"
-
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            events = cur.fetchall()
-        conn.close()
-
-        return events
-    except psycopg2.Error as e:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if not await room_catalog.get(room_id):
+            raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
+
+        version = await data_versions.get("calendar_events")
+        if version is not None:
+            # The default range starts today, so it changes at midnight too
+            etag = make_etag("calendar", room_id, version, *([date.today()] if start is None else []))
+            not_modified = conditional(request, response, etag, CALENDAR_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+    except psycopg.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    # Build query with optional time filters
+    query = """
+        SELECT id, room_id, title, start_time, end_time, organizer
+        FROM calendar_events
+        WHERE room_id = %s
+    """
+    params = [room_id]
+
+    if start:
+        query += " AND start_time >= %s"
+        params.append(start)
+    else:
+        # Default: from start of today
+        query += " AND start_time >= CURRENT_DATE"
+
+    if end:
+        query += " AND end_time <= %s"
+        params.append(end)
+
+    if after:
+        query += " AND (start_time, id) > (%s, %s)"
+        params += list(after)
+
+    query += " ORDER BY start_time ASC, id ASC"
+
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    try:
+        async with db_pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                events = await cur.fetchall()
+
+        if limit and len(events) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(events[-1]["start_time"], events[-1]["id"])
+        return fast_json(events, response)
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/sensors/{room_id}/latest")
-def get_latest_sensor_data(room_id: int):
+async def get_latest_sensor_data(room_id: int, request: Request, response: Response):
     """
     Get the most recent sensor reading for a room.
 
-    Useful for real-time displays.
+    Useful for real-time displays. The ETag is the reading id (Last-Modified
+    its timestamp); revalidating an unchanged reading returns 304.
     """
     try:
-        conn = get_db_connection()
-
         # Verify room exists
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name FROM rooms WHERE id = %s", (room_id,))
-            room = cur.fetchone()
-            if not room:
-                conn.close()
-                raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
+        room = await room_catalog.get(room_id)
+        if not room:
+            raise HTTPException(status_code=404, detail=f"Room {room_id} not found")
 
         # Get latest sensor data
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, room_id, timestamp, temperature, co2, humidity, sound
-                FROM sensor_data
-                WHERE room_id = %s
-                ORDER BY timestamp DESC
-                LIMIT 1
-            """, (room_id,))
-            data = cur.fetchone()
-        conn.close()
+        data = (await get_latest_readings([room_id]))[room_id]
+
+        not_modified = conditional(
+            request, response,
+            make_etag("latest", room_id, room_catalog.version, data["id"] if data else "none"),
+            LATEST_CACHE_CONTROL,
+            last_modified=data["timestamp"] if data else None,
+        )
+        if not_modified:
+            return not_modified
 
         if not data:
-            return {
+            return fast_json({
                 "room_id": room_id,
                 "room_name": room["name"],
                 "message": "No sensor data available",
                 "data": None
-            }
+            }, response)
 
-        return {
+        return fast_json({
             "room_id": room_id,
             "room_name": room["name"],
             "data": dict(data)
-        }
-    except psycopg2.Error as e:
+        }, response)
+    except psycopg.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# ============================================================
+# Sensor Ingest
+# ============================================================
+
+@app.post("/api/sensors/batch", response_model=SensorBatchResult)
+async def ingest_sensor_batch(batch: SensorBatchRequest):
+    """
+    Store many sensor readings, for any number of rooms, in one call.
+
+    Request body:
+    - readings: list of {room_id, timestamp?, temperature?, co2?, humidity?, sound?}
+
+    Readings for unknown rooms or with values outside the sensor_data CHECK
+    ranges are rejected individually (by index, with reasons) and the rest
+    are written with one COPY in a single transaction. Rollups, the latest
+    reading cache and the live stream are updated from that COPY as for any
+    other insert.
+    """
+    try:
+        known = {room["id"] for room in await room_catalog.rooms()}
+
+        def prepare():
+            rows, rejects = validate((vars(reading) for reading in batch.readings), known)
+            return rows, rejects, encode_copy(rows) if rows else None
+
+        # ~10 us per reading: a full batch would hold up the event loop for a second
+        rows, rejects, data = await asyncio.to_thread(prepare)
+        if rows:
+            async with db_pool.connection() as conn, conn.transaction():
+                async with conn.cursor() as cur:
+                    async with cur.copy(COPY_SQL) as copy:
+                        await copy.write(data)
+        return {"accepted": len(rows), "rejected": rejects}
+
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
@@ -338,7 +894,10 @@ def get_latest_sensor_data(room_id: int):
 # ============================================================
 
 @app.post("/api/recommend", response_model=list[RoomScore])
-def recommend_rooms(request: RecommendationRequest):
+async def recommend_rooms(
+    request: RecommendationRequest,
+    limit: Optional[int] = Query(None, ge=1, description="Only return the best N rooms"),
+):
     """
     Get room recommendations based on preferences and requirements.
 
@@ -349,111 +908,140 @@ def recommend_rooms(request: RecommendationRequest):
     - weights: importance of each criterion (temperature, co2, humidity, sound)
     - requirements: facility filters (min_capacity, needs_projector, etc.)
 
+    Query parameters:
+    - limit: return only the top N rooms (ranks stay 1..N)
+
     Returns ranked list of rooms with scores.
+    Results are cached per (normalized) request until new sensor data arrives.
     """
+    request = normalize_recommendation_request(request)
+    epoch = recommendation_cache.epoch
+
     try:
-        conn = get_db_connection()
         req = request.requirements
 
-        # Build query to filter rooms by requirements
-        query = """
-            SELECT id, name, building, floor, capacity,
-                   has_projector, has_whiteboard, has_power_outlets, is_accessible
-            FROM rooms
-            WHERE 1=1
-        """
-        params = []
+        # Filter rooms by requirements using the in-memory catalog
+        rooms = await room_catalog.filter(
+            min_capacity=req.min_capacity,
+            needs_projector=req.needs_projector,
+            needs_whiteboard=req.needs_whiteboard,
+            needs_accessible=req.needs_accessible,
+            min_power_outlets=req.min_power_outlets,
+        )
 
-        if req.min_capacity is not None:
-            query += " AND capacity >= %s"
-            params.append(req.min_capacity)
+        if not rooms:
+            return fast_json([])
 
-        if req.needs_projector is True:
-            query += " AND has_projector = TRUE"
+        # The catalog version is part of the key, so room changes miss too
+        key = (recommendation_cache_key(request), limit, room_catalog.version)
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            return fast_json(cached)
 
-        if req.needs_whiteboard is True:
-            query += " AND has_whiteboard = TRUE"
+        # Latest readings come from the cache; only stale rooms hit the DB
+        readings = await get_latest_readings([room["id"] for room in rooms])
+        rooms_by_id = {room["id"]: room for room in rooms}
 
-        if req.needs_accessible is True:
-            query += " AND is_accessible = TRUE"
+        columns = sensor_columns(rooms, readings)
+        weights, desired_profile = decision_inputs(request)
 
-        if req.min_power_outlets is not None:
-            query += " AND has_power_outlets >= %s"
-            params.append(req.min_power_outlets)
+        # Rank rooms using decision algorithm
+        ranked = rank_rooms_arrays(
+            [room["id"] for room in rooms],
+            [room["name"] for room in rooms],
+            columns, weights, desired_profile, top_k=limit,
+        )
 
-        query += " ORDER BY name"
+        # Add facilities to the returned rooms only
+        for room in ranked:
+            room["facilities"] = room_facilities(rooms_by_id[room["room_id"]])
 
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            rooms = cur.fetchall()
+        recommendation_cache.put(key, ranked, epoch)
+        return fast_json(ranked)
 
-        if not rooms:
-            conn.close()
-            return []
-
-        # Get latest sensor data for each room
-        rooms_with_sensors = []
-        with conn.cursor() as cur:
-            for room in rooms:
-                cur.execute("""
-                    SELECT temperature, co2, humidity, sound
-                    FROM sensor_data
-                    WHERE room_id = %s
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                """, (room["id"],))
-                sensor_data = cur.fetchone()
-
-                room_data = {
-                    "room_id": room["id"],
-                    "room_name": room["name"],
-                    "temperature": float(sensor_data["temperature"]) if sensor_data and sensor_data["temperature"] else None,
-                    "co2": int(sensor_data["co2"]) if sensor_data and sensor_data["co2"] else None,
-                    "humidity": float(sensor_data["humidity"]) if sensor_data and sensor_data["humidity"] else None,
-                    "sound": float(sensor_data["sound"]) if sensor_data and sensor_data["sound"] else None,
-                    "facilities": {
-                        "building": room["building"],
-                        "floor": room["floor"],
-                        "capacity": room["capacity"],
-                        "has_projector": room["has_projector"],
-                        "has_whiteboard": room["has_whiteboard"],
-                        "has_power_outlets": room["has_power_outlets"],
-                        "is_accessible": room["is_accessible"],
-                    }
-                }
-                rooms_with_sensors.append(room_data)
-
-        conn.close()
-
-        # Convert request weights to decision module Weights
-        weights = Weights(
-            temperature=request.weights.temperature,
-            co2=request.weights.co2,
-            humidity=request.weights.humidity,
-            sound=request.weights.sound,
-        )
+    except psycopg.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        # Convert desired_profile if provided
-        desired_profile = None
-        if request.desired_profile:
-            desired_profile = DesiredProfile(
-                temperature=request.desired_profile.temperature,
-                co2=request.desired_profile.co2,
-                humidity=request.desired_profile.humidity,
-                sound=request.desired_profile.sound,
-            )
 
-        # Rank rooms using decision algorithm
-        ranked = rank_rooms(rooms_with_sensors, weights, desired_profile)
+@app.post("/api/recommend/batch", response_model=list[list[RoomScore]])
+async def recommend_rooms_batch(
+    batch: RecommendationBatchRequest,
+    limit: Optional[int] = Query(None, ge=1, description="Only return the best N rooms per request"),
+):
+    """
+    Get room recommendations for many preference sets in one call.
 
-        # Add facilities to results
-        facilities_map = {r["room_id"]: r["facilities"] for r in rooms_with_sensors}
-        for room in ranked:
-            room["facilities"] = facilities_map[room["room_id"]]
+    Request body:
+    - requests: list of recommendation requests (same shape as /api/recommend)
+
+    Query parameters:
+    - limit: return only the top N rooms of each ranking
+
+    Rooms and latest readings are loaded once for the whole batch, and every
+    request is scored together in a worker thread. At most
+    RECOMMEND_BATCH_MAX_ROWS ranked rooms are returned per call in total. Returns one ranked list per request, in
+    request order, each the same as /api/recommend would return for it.
+    """
+    requests = await asyncio.to_thread(
+        lambda: [normalize_recommendation_request(request) for request in batch.requests]
+    )
 
-        return ranked
+    try:
+        await room_catalog.rooms()
+        index = room_catalog.index  # rooms and bitmaps of the same catalog load
+        rooms = index.rooms
+
+        rows = len(requests) * min(limit or len(rooms), len(rooms))
+        if rows > RECOMMEND_BATCH_MAX_ROWS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch would return {rows} ranked rooms (max {RECOMMEND_BATCH_MAX_ROWS}); "
+                       f"pass a smaller limit or fewer requests",
+            )
+
+        # Requests often share requirements; resolve each distinct set once
+        keys = [
+            (req.min_capacity, req.needs_projector, req.needs_whiteboard,
+             req.needs_accessible, req.min_power_outlets)
+            for req in (request.requirements for request in requests)
+        ]
+        candidates = {key: index.candidates(*key) for key in set(keys)}
+        needed = 0
+        for mask in candidates.values():
+            needed |= mask
+
+        # Readings only for rooms some request can be offered
+        readings = await get_latest_readings([room["id"] for room in index.select(needed)])
+        columns = sensor_columns(rooms, readings)
+        flags = {key: index.flags(mask) for key, mask in candidates.items()}
+
+        scoring_requests = [
+            (*decision_inputs(request), flags[key]) for request, key in zip(requests, keys)
+        ]
+
+        def rank():
+            rankings = rank_rooms_batch(
+                [room["id"] for room in rooms],
+                [room["name"] for room in rooms],
+                columns, scoring_requests, top_k=limit, chunk_size=RECOMMEND_BATCH_CHUNK,
+            )
 
-    except psycopg2.Error as e:
+            # Facilities are the same in every ranking; build each block once
+            rooms_by_id = {room["id"]: room for room in rooms}
+            facilities = {}
+            for ranking in rankings:
+                for room in ranking:
+                    room_id = room["room_id"]
+                    if room_id not in facilities:
+                        facilities[room_id] = room_facilities(rooms_by_id[room_id])
+                    room["facilities"] = facilities[room_id]
+            return fast_json(rankings)
+
+        # Scoring and encoding thousands of rankings takes seconds; keep the
+        # event loop (other requests, streams, the sensor feed) running meanwhile
+        return await asyncio.to_thread(rank)
+
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Keyset Pagination
+Opaque cursors for paged list endpoints.
+
+A cursor encodes the sort key (timestamp, id) of the last row of a page;
+the next page continues strictly after it with a row comparison such as
+`(timestamp, id) < (%s, %s)`, which the (room_id, timestamp, id) indexes
+answer with a single seek, however deep the page. The id breaks ties
+between rows with the same timestamp.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+# Response header carrying the cursor of the next page (absent on the last)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Cursor pointing just past the row with this (timestamp, id)."""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """(timestamp, id) of a cursor; raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        if not isinstance(row_id, int):
+            raise ValueError
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
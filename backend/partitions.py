@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom sensor_data Partitions
+Keeps the daily sensor_data partitions ahead of the clock.
+
+sensor_data is range-partitioned by day (database/schema.sql). Readings for
+a day without a partition land in sensor_data_default, which every query
+has to scan, so the API creates upcoming partitions on startup and then
+periodically. Old days are removed by dropping their partitions instead
+of deleting rows.
+
+Run: python partitions.py create [--from 2024-01-01] [--days 7]
+     python partitions.py drop --before 2024-01-01
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date
+
+import psycopg
+import psycopg2
+
+from simulator import DB_CONFIG
+
+
+class PartitionMaintainer:
+    """Background task calling create_sensor_data_partitions() every `interval` seconds."""
+
+    def __init__(self, db, days_ahead: int = 2, interval: float = 3600.0):
+        self.db = db
+        self.days_ahead = days_ahead
+        self.interval = interval
+        self._task = None
+
+        # Counters for stats()
+        self.runs = 0
+        self.created = 0
+        self.errors = 0
+        self.last_run_at = None
+
+    async def ensure(self) -> int:
+        """Create missing partitions from today to `days_ahead` days ahead."""
+        async with self.db.connection() as conn:
+            cur = await conn.execute(
+                "SELECT create_sensor_data_partitions(CURRENT_DATE, %s) AS created", (self.days_ahead,)
+            )
+            created = (await cur.fetchone())["created"]
+        self.runs += 1
+        self.created += created
+        self.last_run_at = time.time()
+        return created
+
+    def start(self):
+        """Start the periodic task (must be called on the event loop)."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.ensure()
+            except psycopg.Error as e:
+                self.errors += 1
+                print(f"Partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "days_ahead": self.days_ahead,
+            "runs": self.runs,
+            "created": self.created,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+        }
+
+
+def run(query: str, params: tuple) -> int:
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom sensor_data partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("create", help="create daily partitions (moves matching rows out of the default one)")
+    p.add_argument("--from", dest="start", type=date.fromisoformat, default=date.today(),
+                   help="first day (default: today)")
+    p.add_argument("--days", type=int, default=2, help="days after the first one")
+
+    p = sub.add_parser("drop", help="drop the partitions of days before a date")
+    p.add_argument("--before", type=date.fromisoformat, required=True)
+
+    args = parser.parse_args()
+    if args.command == "create":
+        created = run("SELECT create_sensor_data_partitions(%s, %s)", (args.start, args.days))
+        print(f"Created {created} partitions")
+    else:
+        dropped = run("SELECT drop_sensor_data_partitions(%s)", (args.before,))
+        print(f"Dropped {dropped} partitions")
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Recent History
+Last hours of raw readings per room, kept in memory as NumPy columns.
+
+Each room holds parallel arrays (id, timestamp, temperature, co2, humidity,
+sound) sorted by (timestamp, id). The sensor feed appends new rows; rows
+older than `horizon` are dropped when a room's arrays fill up, so the
+arrays slide along with the clock like a ring buffer. A room is loaded from
+the database the first time a request could be answered from it; from then
+on it is complete back to `covered_since`, and raw history requests for a
+window inside that are answered without a query.
+
+Memory per reading is 32 bytes (int64 id and microsecond timestamp, four
+float32 values; NaN stands for NULL), plus up to as much again of spare
+capacity. At the simulator's rate of one reading every 3 seconds that is
+1200 readings, 37.5 KiB, per room per hour: a 6 hour horizon for 1000
+rooms takes 220-440 MiB. `python benchmark.py recent` measures it.
+
+The feed delivers every committed row, late commits included (see
+feed.py), so a loaded room stays complete as long as the feed is current.
+While it is disconnected or behind by more than `max_lag` seconds, and
+until it has settled after starting, every request goes to the database.
+A load can read rows the feed has not delivered yet; when the feed brings
+them, the copies already held are skipped, so every reading is kept once.
+Readings deleted from sensor_data stay here until they age out.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from history import local_naive
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+VALUE_COLUMNS = ("temperature", "co2", "humidity", "sound")
+INITIAL_CAPACITY = 256
+
+
+def to_micros(value: datetime) -> int:
+    """Naive local datetime as integer microseconds (exact, unlike float seconds)."""
+    return (value - EPOCH) // MICROSECOND
+
+
+class RoomHistory:
+    """Sorted column arrays of one room's recent readings."""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((len(VALUE_COLUMNS), capacity), dtype=np.float32)
+        self.covered_since: Optional[int] = None  # complete from here on (microseconds)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.times.nbytes + self.values.nbytes
+
+    def append(self, ids: np.ndarray, times: np.ndarray, values: np.ndarray, cutoff: int) -> int:
+        """
+        Add rows (sorted by time, id), dropping rows older than `cutoff` to make room.
+
+        Rows already held are skipped: a load can read a committed row before
+        the feed delivers it. Returns the number of rows added.
+        """
+        size = self.size
+        if size and len(ids):
+            # A held copy has the same timestamp, so only the tail from times[0] can match
+            tail = int(np.searchsorted(self.times[:size], times[0], side="left"))
+            if tail < size:
+                new = ~np.isin(ids, self.ids[tail:size])
+                if not new.all():
+                    ids, times, values = ids[new], times[new], values[:, new]
+        if not len(ids):
+            return 0
+        if self.size + len(ids) > len(self.ids):
+            self._compact(cutoff, len(ids))
+        size = self.size
+        if size and times[0] < self.times[size - 1]:
+            # Late rows (e.g. replayed by a gateway buffer): merge and re-sort
+            ids = np.concatenate([self.ids[:size], ids])
+            times = np.concatenate([self.times[:size], times])
+            values = np.concatenate([self.values[:, :size], values], axis=1)
+            order = np.lexsort((ids, times))
+            ids, times, values = ids[order], times[order], values[:, order]
+            size = 0
+        end = size + len(ids)
+        self.ids[size:end] = ids
+        self.times[size:end] = times
+        self.values[:, size:end] = values
+        added = end - self.size
+        self.size = end
+        return added
+
+    def _compact(self, cutoff: int, incoming: int):
+        keep = int(np.searchsorted(self.times[:self.size], cutoff, side="left"))
+        size = self.size - keep
+        capacity = len(self.ids)
+        while size + incoming > capacity * 3 // 4:
+            capacity *= 2
+        ids = np.empty(capacity, dtype=np.int64)
+        times = np.empty(capacity, dtype=np.int64)
+        values = np.empty((len(VALUE_COLUMNS), capacity), dtype=np.float32)
+        ids[:size] = self.ids[keep:self.size]
+        times[:size] = self.times[keep:self.size]
+        values[:, :size] = self.values[:, keep:self.size]
+        self.ids, self.times, self.values, self.size = ids, times, values, size
+        if self.covered_since is not None:
+            self.covered_since = max(self.covered_since, cutoff)
+
+    def newest(self, start: Optional[int], end: Optional[int],
+               before: Optional[tuple[int, int]], limit: int) -> tuple[np.ndarray, bool]:
+        """
+        Indexes of the newest `limit` rows in start..end before the cursor,
+        newest first, and whether that is the complete answer.
+        """
+        times = self.times[:self.size]
+        low = 0
+        if start is not None:
+            low = int(np.searchsorted(times, start, side="left"))
+        high = self.size
+        if end is not None:
+            high = int(np.searchsorted(times, end, side="right"))
+        if before is not None:
+            # (timestamp, id) < cursor: earlier timestamps, or the same one with a smaller id
+            before_time, before_id = before
+            earlier = int(np.searchsorted(times, before_time, side="left"))
+            same = int(np.searchsorted(times, before_time, side="right"))
+            while same > earlier and self.ids[same - 1] >= before_id:
+                same -= 1
+            high = min(high, same)
+        low = max(low, int(np.searchsorted(times, self.covered_since, side="left")))
+        selected = np.arange(high - 1, max(low, high - limit) - 1, -1)
+        # Complete if the window lies inside the covered span or the limit was reached in it
+        complete = len(selected) == limit or (start is not None and start >= self.covered_since)
+        return selected, complete
+
+    def rows(self, room_id: int, indexes: np.ndarray) -> list[dict]:
+        ids = self.ids[indexes].tolist()
+        times = self.times[indexes].tolist()
+        values = [
+            [None if v != v else round(v, 1) for v in column]
+            for column in self.values[:, indexes].tolist()
+        ]
+        return [
+            {
+                "id": row_id,
+                "room_id": room_id,
+                "timestamp": EPOCH + timedelta(microseconds=micros),
+                "temperature": temperature,
+                "co2": int(co2) if co2 is not None else None,
+                "humidity": humidity,
+                "sound": sound,
+            }
+            for row_id, micros, temperature, co2, humidity, sound in zip(ids, times, *values)
+        ]
+
+
+def columns(rows: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """id, timestamp and value arrays of sensor_data row dicts, sorted by (timestamp, id)."""
+    ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+    times = np.fromiter((to_micros(row["timestamp"]) for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array(
+        [[np.nan if row[column] is None else float(row[column]) for row in rows] for column in VALUE_COLUMNS],
+        dtype=np.float32,
+    ).reshape(len(VALUE_COLUMNS), len(rows))
+    order = np.lexsort((ids, times))
+    return ids[order], times[order], values[:, order]
+
+
+class RecentHistory:
+    """
+    Per-room RoomHistory arrays fed by the sensor feed.
+
+    `get` answers a raw history request (newest first, like series_query)
+    or returns None when the request reaches further back than a room's
+    covered span, in which case the caller queries the database.
+    """
+
+    def __init__(self, db, horizon: timedelta = timedelta(hours=6), feed=None, max_lag: float = 5.0):
+        self.db = db
+        self.horizon = horizon
+        self.feed = feed
+        self.max_lag = max_lag
+        self._rooms: dict[int, RoomHistory] = {}
+        self._loading: dict[int, asyncio.Task] = {}
+
+        # Counters for stats()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.rows_appended = 0
+
+    def _feed_current(self) -> bool:
+        return self.feed is None or self.feed.is_current(self.max_lag)
+
+    def _cutoff(self) -> int:
+        return to_micros(datetime.now() - self.horizon)
+
+    def update(self, rows: list[dict]):
+        """Append new sensor_data rows (usable directly as a feed subscriber)."""
+        cutoff = self._cutoff()
+        by_room: dict[int, list[dict]] = {}
+        for row in rows:
+            by_room.setdefault(row["room_id"], []).append(row)
+        for room_id, room_rows in by_room.items():
+            ids, times, values = columns(room_rows)
+            keep = times >= cutoff
+            if not keep.all():
+                ids, times, values = ids[keep], times[keep], values[:, keep]
+            if len(ids):
+                room = self._rooms.setdefault(room_id, RoomHistory())
+                self.rows_appended += room.append(ids, times, values, cutoff)
+
+    def load(self, room_id: int, rows: list[dict], covered_since: datetime):
+        """
+        Make a room complete from `covered_since` on with rows read from the database.
+
+        Rows the feed appended meanwhile are kept; rows in both are taken once.
+        """
+        ids, times, values = columns(rows)
+        current = self._rooms.get(room_id)
+        if current is not None and current.size:
+            extra = ~np.isin(current.ids[:current.size], ids)
+            ids = np.concatenate([ids, current.ids[:current.size][extra]])
+            times = np.concatenate([times, current.times[:current.size][extra]])
+            values = np.concatenate([values, current.values[:, :current.size][:, extra]], axis=1)
+            order = np.lexsort((ids, times))
+            ids, times, values = ids[order], times[order], values[:, order]
+        room = RoomHistory(max(INITIAL_CAPACITY, len(ids) * 2))
+        room.append(ids, times, values, self._cutoff())
+        room.covered_since = to_micros(covered_since)
+        self._rooms[room_id] = room
+        self.loads += 1
+
+    async def _load(self, room_id: int):
+        since = datetime.now() - self.horizon
+        async with self.db.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, room_id, timestamp, temperature, co2, humidity, sound
+                    FROM sensor_data
+                    WHERE room_id = %s AND timestamp >= %s
+                """, (room_id, since))
+                rows = await cur.fetchall()
+        self.load(room_id, rows, since)
+
+    async def get(self, room_id: int, start: Optional[datetime], end: Optional[datetime],
+                  limit: int, before: Optional[tuple[datetime, int]] = None) -> Optional[list[dict]]:
+        """Newest `limit` raw rows in start..end after the cursor, or None if not all held here."""
+        if not self._feed_current():
+            self.misses += 1
+            return None
+        room = self._rooms.get(room_id)
+        if (room is None or room.covered_since is None) and (
+                start is None or local_naive(start) >= datetime.now() - self.horizon):
+            # Share one load between concurrent requests for the room
+            task = self._loading.get(room_id)
+            if task is None:
+                task = self._loading[room_id] = asyncio.create_task(self._load(room_id))
+                task.add_done_callback(lambda _: self._loading.pop(room_id, None))
+            await asyncio.shield(task)
+        return self.lookup(room_id, start, end, limit, before)
+
+    def lookup(self, room_id: int, start: Optional[datetime], end: Optional[datetime],
+               limit: int, before: Optional[tuple[datetime, int]] = None) -> Optional[list[dict]]:
+        """Like `get`, but None for rooms that were not loaded yet."""
+        room = self._rooms.get(room_id)
+        start = local_naive(start) if start else None
+        if not self._feed_current() or room is None or room.covered_since is None or (
+                start is not None and to_micros(start) < room.covered_since):
+            self.misses += 1
+            return None
+
+        selected, complete = room.newest(
+            to_micros(start) if start else None,
+            to_micros(local_naive(end)) if end else None,
+            (to_micros(local_naive(before[0])), before[1]) if before else None,
+            limit,
+        )
+        if not complete:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return room.rows(room_id, selected)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "horizon_s": self.horizon.total_seconds(),
+            "feed_current": self._feed_current(),
+            "rooms": len(self._rooms),
+            "readings": sum(room.size for room in self._rooms.values()),
+            "bytes": sum(room.nbytes for room in self._rooms.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "loads": self.loads,
+            "rows_appended": self.rows_appended,
+        }
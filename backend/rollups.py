@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Sensor Rollups
+Rebuilds the sensor_rollups table from sensor_data.
+
+The sensor_data_rollup trigger keeps rollups current on every insert; use
+this after deleting or editing readings, or to backfill rows written before
+the trigger existed. Rebuilding is idempotent: whole days are recomputed
+from the raw readings.
+
+Run: python rollups.py rebuild [--room 3] [--from 2024-01-01] [--to 2024-02-01]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import psycopg2
+
+from simulator import DB_CONFIG
+
+
+def rebuild(room_id=None, start=None, end=None) -> int:
+    """Recompute rollups of one room (None = all) between start and end; returns rows written."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT rebuild_sensor_rollups(%s, %s, %s)", (room_id, start, end))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom sensor rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild", help="recompute rollups from sensor_data")
+    p.add_argument("--room", type=int, help="room id (default: all rooms)")
+    p.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                   help="first day to rebuild (default: oldest reading)")
+    p.add_argument("--to", dest="end", type=datetime.fromisoformat,
+                   help="last day to rebuild (default: newest reading)")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    rows = rebuild(args.room, args.start, args.end)
+    print(f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.1f}s")
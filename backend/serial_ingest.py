@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Serial Ingest
+Reads Arduino sensor lines (Comm B) on the Raspberry Pi and stores them.
+
+Each Arduino sends newline-delimited JSON over USB serial, e.g.
+{"temp": 22.5, "co2": 650, "humidity": 45, "sound": 40}. Every device is
+mapped to one room. All devices are read concurrently on one event loop
+with non-blocking file descriptors; parsed readings go into a bounded
+queue (readings are dropped and counted when it is full), and a writer
+takes them off in batches, flushed when `batch_size` readings are waiting
+or `flush_interval` seconds have passed. Batches are validated like
+POST /api/sensors/batch and written with COPY.
+
+Devices are opened with termios only, so pseudo-terminals work as stand-ins
+for Arduinos (see `python benchmark.py serial`). A device that disappears
+(unplugged, EOF) is reopened every `reconnect_delay` seconds.
+
+With --buffer, readings are stored in a local buffer first and forwarded to
+the database from there (see buffer.py), so a slow or unreachable database
+neither blocks reading nor loses readings.
+
+Run: python serial_ingest.py --device /dev/ttyACM0=1 --device /dev/ttyACM1=2
+     python serial_ingest.py --device /dev/ttyACM0=1 --buffer /var/lib/comfortroom/buffer.db
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import termios
+import time
+import tty
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+import psycopg2
+
+import ingest
+from buffer import CATCH_UP_RATE, Forwarder, ReadingBuffer
+from simulator import DB_CONFIG, get_room_ids
+
+# Arduino sketch key -> sensor_data column
+FIELDS = {
+    "temp": "temperature",
+    "co2": "co2",
+    "humidity": "humidity",
+    "sound": "sound",
+}
+
+SERIAL_BAUD = 9600
+READ_SIZE = 4096
+MAX_LINE = 1024               # longer partial lines are discarded
+
+QUEUE_SIZE = 10000            # parsed readings waiting for the writer
+BATCH_SIZE = 500              # readings per write
+FLUSH_INTERVAL = 1.0          # seconds before a partial batch is written
+RECONNECT_DELAY = 5.0         # seconds between attempts to reopen a device
+RETRY_DELAY = 5.0             # seconds before a failed write is retried
+STATS_INTERVAL = 60           # seconds between stats lines of the daemon
+
+BAUD_RATES = {
+    9600: termios.B9600,
+    19200: termios.B19200,
+    38400: termios.B38400,
+    57600: termios.B57600,
+    115200: termios.B115200,
+}
+
+
+def parse_line(line: bytes) -> Optional[dict]:
+    """Sensor values of one Arduino line by column name (None if malformed)."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    reading = {}
+    for key, column in FIELDS.items():
+        value = data.get(key)
+        if value is not None:
+            reading[column] = value
+    return reading or None
+
+
+def open_serial(path: str, baud: int = SERIAL_BAUD) -> int:
+    """Open a serial device non-blocking in raw mode; returns the file descriptor."""
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        if os.isatty(fd):
+            tty.setraw(fd)
+            attrs = termios.tcgetattr(fd)
+            attrs[4] = attrs[5] = BAUD_RATES[baud]  # ispeed, ospeed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def copy_rows(conn, rows: list) -> None:
+    """COPY validated rows (see ingest.validate) into sensor_data without committing."""
+    if rows:
+        with conn.cursor() as cur:
+            cur.copy_expert(ingest.COPY_SQL, io.BytesIO(ingest.encode_copy(rows)))
+
+
+class Device:
+    """One serial device and its partial line."""
+
+    def __init__(self, path: str, room_id: int):
+        self.path = path
+        self.room_id = room_id
+        self.fd = None
+        self.buffer = b""
+        self.reopen = None
+
+
+class SerialIngest:
+    """
+    Reads several serial devices and hands their readings to `write` in batches.
+
+    `write` is awaited with a list of reading dicts (room_id, timestamp and
+    the sensor columns present in the line) and returns how many of them
+    were stored. If it raises, the batch is kept and retried after
+    `retry_delay` seconds while the queue absorbs new readings.
+    """
+
+    def __init__(
+        self,
+        devices: dict[str, int],
+        write: Callable[[list[dict]], Awaitable[int]],
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        queue_size: int = QUEUE_SIZE,
+        baud: int = SERIAL_BAUD,
+        reconnect_delay: float = RECONNECT_DELAY,
+        retry_delay: float = RETRY_DELAY,
+    ):
+        self.devices = [Device(path, room_id) for path, room_id in devices.items()]
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.baud = baud
+        self.reconnect_delay = reconnect_delay
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._writer = None
+        self._pending: list[dict] = []
+
+        # Counters for stats()
+        self.lines = 0
+        self.malformed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.written = 0
+        self.rejected = 0
+        self.errors = 0
+        self.last_batch_at = None
+
+    async def start(self):
+        """Open every device and start the writer (must be called on the event loop)."""
+        for device in self.devices:
+            self._open(device)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        """Stop reading, then write whatever is queued."""
+        for device in self.devices:
+            if device.reopen:
+                device.reopen.cancel()
+            self._close(device)
+        if self._writer:
+            await self.queue.put(None)
+            await self._writer
+
+    def _open(self, device: Device):
+        device.reopen = None
+        try:
+            device.fd = open_serial(device.path, self.baud)
+        except OSError as e:
+            print(f"Serial {device.path}: {e}; retrying in {self.reconnect_delay}s")
+            device.reopen = asyncio.get_running_loop().call_later(self.reconnect_delay, self._open, device)
+            return
+        device.buffer = b""
+        asyncio.get_running_loop().add_reader(device.fd, self._on_readable, device)
+
+    def _close(self, device: Device):
+        if device.fd is not None:
+            asyncio.get_running_loop().remove_reader(device.fd)
+            os.close(device.fd)
+            device.fd = None
+
+    def _on_readable(self, device: Device):
+        try:
+            chunk = os.read(device.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b""  # EIO: device gone (or pty master closed)
+        if not chunk:
+            self._close(device)
+            print(f"Serial {device.path}: disconnected; reopening in {self.reconnect_delay}s")
+            device.reopen = asyncio.get_running_loop().call_later(self.reconnect_delay, self._open, device)
+            return
+
+        # One timestamp per read: lines that arrive together were sent together
+        now = datetime.now()
+        lines = (device.buffer + chunk).split(b"\n")
+        device.buffer = lines.pop()
+        if len(device.buffer) > MAX_LINE:
+            self.malformed += 1
+            device.buffer = b""
+        for line in lines:
+            if not line.strip():
+                continue
+            self.lines += 1
+            reading = parse_line(line)
+            if reading is None:
+                self.malformed += 1
+                continue
+            reading["room_id"] = device.room_id
+            reading["timestamp"] = now
+            try:
+                self.queue.put_nowait(reading)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while True:
+            deadline = loop.time() + self.flush_interval
+            while not stopping and len(self._pending) < self.batch_size:
+                # Only wait (and yield to the readers) once the queue is empty
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        reading = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    reading = self.queue.get_nowait()
+                if reading is None:
+                    stopping = True
+                else:
+                    self._pending.append(reading)
+
+            if self._pending:
+                batch = self._pending[:self.batch_size]
+                try:
+                    written = await self.write(batch)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Serial ingest write failed: {e}; retrying in {self.retry_delay}s")
+                    if stopping:
+                        return
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                del self._pending[:len(batch)]
+                self.batches += 1
+                self.written += written
+                self.rejected += len(batch) - written
+                self.last_batch_at = time.time()
+            elif stopping:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self.devices),
+            "connected": sum(device.fd is not None for device in self.devices),
+            "lines": self.lines,
+            "malformed": self.malformed,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize() + len(self._pending),
+            "batches": self.batches,
+            "written": self.written,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "last_batch_at": self.last_batch_at,
+        }
+
+
+class DatabaseWriter:
+    """
+    `write` callback for SerialIngest: validates a batch and COPYs it into sensor_data.
+
+    Runs on a worker thread so devices keep being read during the write.
+    The connection is (re)opened on demand, which also reloads the room ids
+    readings are validated against.
+    """
+
+    def __init__(self, connect_kwargs: dict = DB_CONFIG):
+        self.connect_kwargs = connect_kwargs
+        self.conn = None
+        self.room_ids: set[int] = set()
+
+    async def __call__(self, readings: list[dict]) -> int:
+        return await asyncio.to_thread(self._write, readings)
+
+    def _write(self, readings: list[dict]) -> int:
+        if self.conn is None:
+            self.conn = psycopg2.connect(**self.connect_kwargs)
+            self.room_ids = set(get_room_ids(self.conn))
+        rows, rejects = ingest.validate(readings, self.room_ids)
+        if rejects:
+            print(f"Serial ingest rejected {len(rejects)} readings, "
+                  f"e.g. room {readings[rejects[0]['index']]['room_id']}: {rejects[0]['errors']}")
+        try:
+            copy_rows(self.conn, rows)
+            self.conn.commit()
+        except psycopg2.Error:
+            self.close()
+            raise
+        return len(rows)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+async def run(devices: dict[str, int], batch_size: int, flush_interval: float, baud: int,
+              buffer_path: Optional[str] = None, catch_up_rate: float = CATCH_UP_RATE):
+    writer = DatabaseWriter()
+    buffer = forwarder = None
+    if buffer_path:
+        # Store-and-forward: readings go to the local buffer, which never
+        # waits on the database, and are forwarded from there
+        buffer = ReadingBuffer(buffer_path)
+        forwarder = Forwarder(buffer, writer, max_rate=catch_up_rate)
+        forwarder.start()
+    reader = SerialIngest(devices, buffer or writer, batch_size=batch_size, flush_interval=flush_interval,
+                          baud=baud)
+    await reader.start()
+    try:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            stats = reader.stats()
+            line = (f"[{datetime.now():%H:%M:%S}] {stats['connected']}/{stats['devices']} devices, "
+                    f"{stats['lines']} lines, {stats['written']} {'buffered' if buffer else 'written'}, "
+                    f"{stats['rejected']} rejected, {stats['malformed']} malformed, {stats['dropped']} dropped")
+            if buffer:
+                buffered, forwarded = buffer.stats(), forwarder.stats()
+                line += (f"; buffer depth {buffered['depth']} (oldest {buffered['oldest_age_s']}s), "
+                         f"{forwarded['forwarded']} forwarded at {forwarded['replay_rate']:.0f}/s, "
+                         f"{forwarded['rejected']} rejected")
+            print(line)
+    finally:
+        await reader.stop()
+        if forwarder:
+            await forwarder.stop()
+            buffer.close()
+        writer.close()
+
+
+def parse_device(value: str) -> tuple[str, int]:
+    path, _, room_id = value.rpartition("=")
+    if not path:
+        raise argparse.ArgumentTypeError("expected PATH=ROOM_ID")
+    return path, int(room_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom serial ingest (Arduino -> sensor_data)")
+    parser.add_argument("--device", type=parse_device, action="append", required=True,
+                        metavar="PATH=ROOM_ID", help="serial device and the room it measures (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--baud", type=int, choices=sorted(BAUD_RATES), default=SERIAL_BAUD)
+    parser.add_argument("--buffer", metavar="PATH",
+                        help="store readings in this local SQLite file first and forward them from there")
+    parser.add_argument("--catch-up-rate", type=float, default=CATCH_UP_RATE,
+                        help="readings/s forwarded at most while replaying a backlog (with --buffer)")
+    args = parser.parse_args()
+
+    print(f"Reading {len(args.device)} devices: "
+          + ", ".join(f"{path} -> room {room_id}" for path, room_id in args.device))
+    try:
+        asyncio.run(run(dict(args.device), args.batch_size, args.flush_interval, args.baud,
+                        args.buffer, args.catch_up_rate))
+    except KeyboardInterrupt:
+        print("\nSerial ingest stopped.")
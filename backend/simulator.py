@@ -3,8 +3,14 @@
 ComfortRoom Data Simulator
 Generates fake sensor data for testing without hardware.
 Run: python simulator.py
+     python simulator.py --once
+     python simulator.py --load --rooms 5000 --rate 50000 --workers 4 --duration 60
 """
 
+import argparse
+import io
+import multiprocessing
+import queue
 import random
 import time
 from datetime import datetime
@@ -13,6 +19,8 @@ from typing import Optional
 import psycopg2
 from psycopg2.extras import execute_values
 
+import ingest
+
 
 # Database configuration
 DB_CONFIG = {
@@ -33,6 +41,11 @@ SENSOR_RANGES = {
 # How often to insert data (seconds)
 INSERT_INTERVAL = 3
 
+# Load mode: each worker writes one COPY per tick of this many seconds,
+# and progress is printed every LOAD_REPORT_INTERVAL seconds.
+LOAD_TICK = 0.2
+LOAD_REPORT_INTERVAL = 5
+
 
 def get_db_connection():
     """Create database connection."""
@@ -184,12 +197,202 @@ def insert_single_batch():
     conn.close()
 
 
-if __name__ == "__main__":
-    import sys
+# ============================================================
+# Load generation: sharded workers writing with COPY at a fixed rate
+# ============================================================
+
+def ensure_rooms(conn, count: int) -> list[int]:
+    """Return `count` room ids, creating synthetic "Load" rooms if there are fewer."""
+    room_ids = get_room_ids(conn)
+    missing = count - len(room_ids)
+    if missing > 0:
+        with conn.cursor() as cur:
+            rows = execute_values(
+                cur,
+                """
+                INSERT INTO rooms (name, building, floor, capacity,
+                                   has_projector, has_whiteboard, has_power_outlets, is_accessible)
+                VALUES %s
+                RETURNING id
+                """,
+                [
+                    (f"Load {i:05d}", f"Load {i % 20}", i % 6, 10 + i % 90,
+                     i % 2 == 0, i % 3 != 0, i % 30, i % 4 != 0)
+                    for i in range(len(room_ids), count)
+                ],
+                fetch=True,
+                page_size=1000,
+            )
+        conn.commit()
+        room_ids += [row[0] for row in rows]
+        print(f"Created {missing} synthetic rooms")
+    return room_ids[:count]
+
+
+def load_worker(room_ids: list[int], rate: float, duration: float, tick: float,
+                results: multiprocessing.Queue):
+    """
+    Write `rate` readings/s for this worker's shard of rooms until `duration` ends.
+
+    Every tick writes rate * tick readings, cycling through the shard, as one
+    COPY + COMMIT. Ticks are scheduled against a fixed start time, so a slow
+    commit is caught up on by the next ticks instead of lowering the rate;
+    a worker that cannot keep up simply falls behind and reports it.
+    Per tick, (readings, commit latency in ms, seconds behind schedule) is
+    put on `results`; None marks the end.
+    """
+    conn = get_db_connection()
+    previous_data: dict[int, dict] = {}
+    position = 0
+    owed = 0.0
+    started = time.perf_counter()
+    try:
+        ticks = 0
+        while True:
+            scheduled = started + ticks * tick
+            if scheduled - started >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            ticks += 1
+
+            owed += rate * tick
+            count = int(owed)
+            owed -= count
+            if not count:
+                continue
+
+            rows = []
+            for _ in range(count):
+                room_id = room_ids[position]
+                position = (position + 1) % len(room_ids)
+                data = generate_room_data(room_id, previous_data.get(room_id))
+                previous_data[room_id] = data
+                rows.append((data["room_id"], data["timestamp"], data["temperature"],
+                             data["co2"], data["humidity"], data["sound"]))
+
+            commit_started = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.copy_expert(ingest.COPY_SQL, io.BytesIO(ingest.encode_copy(rows)))
+            conn.commit()
+            finished = time.perf_counter()
+            results.put((count, (finished - commit_started) * 1000, max(0.0, finished - scheduled - tick)))
+    finally:
+        conn.close()
+        results.put(None)
+
 
-    if len(sys.argv) > 1 and sys.argv[1] == "--once":
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def run_load(rooms: int, rate: float, workers: int, duration: float, tick: float = LOAD_TICK):
+    """
+    Stress the database ingest path and report what it sustained.
+
+    Rooms are split into `workers` shards, each owned by one process with its
+    own connection writing rate / workers readings/s. Prints achieved
+    readings/s and COPY+COMMIT latency percentiles, periodically and at the end.
+    """
+    conn = get_db_connection()
+    try:
+        room_ids = ensure_rooms(conn, rooms)
+    finally:
+        conn.close()
+    if not room_ids:
+        print("ERROR: --rooms must be at least 1.")
+        return
+    workers = max(1, min(workers, len(room_ids)))
+
+    print("ComfortRoom Load Generator")
+    print("=" * 40)
+    print(f"{len(room_ids)} rooms, {workers} workers, target {rate:.0f} readings/s "
+          f"for {duration:.0f}s (one COPY per worker every {tick}s)\n")
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=load_worker,
+            args=(room_ids[i::workers], rate / workers, duration, tick, results),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+
+    latencies = []
+    total = 0
+    behind = 0.0
+    interval_count = 0
+    interval_latencies = []
+    running = workers
+    started = last_report = time.perf_counter()
+    for process in processes:
+        process.start()
+    try:
+        while running:
+            try:
+                result = results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                result = ()
+            if result is None:
+                running -= 1
+            elif result:
+                count, latency, lag = result
+                total += count
+                interval_count += count
+                latencies.append(latency)
+                interval_latencies.append(latency)
+                behind = max(behind, lag)
+
+            now = time.perf_counter()
+            if now - last_report >= LOAD_REPORT_INTERVAL:
+                interval_latencies.sort()
+                print(f"[{datetime.now():%H:%M:%S}] {interval_count / (now - last_report):>9.0f} readings/s  "
+                      f"commit p50={percentile(interval_latencies, 0.50):.1f}ms "
+                      f"p99={percentile(interval_latencies, 0.99):.1f}ms")
+                interval_count = 0
+                interval_latencies = []
+                last_report = now
+    except KeyboardInterrupt:
+        print("\nLoad generator stopped.")
+        for process in processes:
+            process.terminate()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"\n{total} readings in {elapsed:.1f}s: {total / elapsed:.0f} readings/s "
+          f"(target {rate:.0f}, {len(latencies)} commits)")
+    print(f"  commit latency p50={percentile(latencies, 0.50):.1f}ms "
+          f"p95={percentile(latencies, 0.95):.1f}ms p99={percentile(latencies, 0.99):.1f}ms "
+          f"max={latencies[-1] if latencies else 0.0:.1f}ms")
+    if behind > tick:
+        print(f"  workers fell up to {behind:.1f}s behind schedule: the target rate is above "
+              f"what this setup sustains")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ComfortRoom data simulator")
+    parser.add_argument("--once", action="store_true", help="insert a single batch and exit")
+    parser.add_argument("--load", action="store_true", help="load generation mode")
+    parser.add_argument("--rooms", type=int, default=1000,
+                        help="rooms to write to (load mode; synthetic rooms are created if needed)")
+    parser.add_argument("--rate", type=float, default=10000, help="target readings/s in total (load mode)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes, each owning a shard of the rooms (load mode)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run (load mode)")
+    parser.add_argument("--tick", type=float, default=LOAD_TICK, help="seconds between COPYs per worker (load mode)")
+    args = parser.parse_args()
+
+    if args.once:
         # Single batch mode for testing
         insert_single_batch()
+    elif args.load:
+        run_load(args.rooms, args.rate, args.workers, args.duration, args.tick)
     else:
         # Continuous simulation
         run_simulator()
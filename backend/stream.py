@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+ComfortRoom Live Sensor Stream
+Fans new sensor_data rows out to Server-Sent Events clients.
+
+The broadcaster is a sensor feed subscriber: every row is encoded as an SSE
+frame once and the same bytes are queued for each client watching its room,
+so connected clients cost no database queries. Each client has a bounded
+queue; when a slow consumer falls behind, the oldest frames are dropped and
+the client is told how many it missed, so it can reload its history.
+
+Readings are sent in the order the sensor feed delivers them, which is not
+id order: a late commit arrives after rows with higher ids. The SSE event
+id is therefore not the row id but the feed's settled id when the row was
+published; every row at or below it had been sent by then, so replaying
+the rows above a client's Last-Event-ID misses nothing. Rows sent twice
+that way (at most the ones between the settled id and the newest id) carry
+their row id in the data for the client to skip.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Optional
+
+
+def encode_row(row: dict, event_id: Optional[int] = None) -> bytes:
+    """
+    SSE frame for a sensor_data row (same fields as the SensorData model),
+    with `event_id` (default: the row id) as the SSE event id.
+    """
+    data = json.dumps({
+        "id": row["id"],
+        "room_id": row["room_id"],
+        "timestamp": row["timestamp"].isoformat(),
+        "temperature": float(row["temperature"]) if row["temperature"] is not None else None,
+        "co2": row["co2"],
+        "humidity": float(row["humidity"]) if row["humidity"] is not None else None,
+        "sound": float(row["sound"]) if row["sound"] is not None else None,
+    })
+    event_id = row["id"] if event_id is None else event_id
+    return f"id: {event_id}\nevent: reading\ndata: {data}\n\n".encode()
+
+
+def encode_dropped(count: Optional[int]) -> bytes:
+    """SSE frame telling a client that `count` readings (None = unknown) were skipped."""
+    return f"event: dropped\ndata: {json.dumps({'count': count})}\n\n".encode()
+
+
+class Subscription:
+    """One client's bounded frame queue."""
+
+    def __init__(self, room_ids: Optional[set[int]], max_queue: int):
+        self.room_ids = room_ids
+        self.max_queue = max_queue
+        self.replayed: set[int] = set()  # ids sent by the replay, skipped once when queued
+        self._frames: deque[tuple[int, bytes]] = deque()
+        self._ready = asyncio.Event()
+        self._dropped = 0  # not yet reported to the client
+        self.dropped = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._frames)
+
+    def push(self, row_id: int, frame: bytes):
+        if len(self._frames) >= self.max_queue:
+            self._frames.popleft()
+            self._dropped += 1
+            self.dropped += 1
+        self._frames.append((row_id, frame))
+        self._ready.set()
+
+    async def next_frames(self, timeout: float) -> Optional[bytes]:
+        """
+        Wait up to `timeout` seconds for frames and return them joined.
+
+        Returns None on timeout. Frames for rows the replay already sent are
+        skipped; everything else is sent, late commits included.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+
+        frames, self._frames = self._frames, deque()
+        chunks = []
+        if self._dropped:
+            chunks.append(encode_dropped(self._dropped))
+            self._dropped = 0
+        for row_id, frame in frames:
+            if self.replayed and row_id in self.replayed:
+                self.replayed.discard(row_id)
+                continue
+            chunks.append(frame)
+        return b"".join(chunks)
+
+
+class SensorBroadcaster:
+    """Feed subscriber that fans rows out to live stream clients."""
+
+    def __init__(self, max_queue: int = 1000, feed=None):
+        self.max_queue = max_queue
+        self.feed = feed
+        self._subscriptions: set[Subscription] = set()
+        self._all_rooms: set[Subscription] = set()
+        self._by_room: dict[int, set[Subscription]] = {}
+
+        # Counters for stats()
+        self.rows = 0
+        self.frames = 0
+        self.dropped_closed = 0  # drops of clients that have disconnected
+
+    def subscribe(self, room_ids: Optional[set[int]] = None) -> Subscription:
+        """Register a client for rows of `room_ids` (None = every room)."""
+        subscription = Subscription(room_ids, self.max_queue)
+        self._subscriptions.add(subscription)
+        if room_ids is None:
+            self._all_rooms.add(subscription)
+        else:
+            for room_id in room_ids:
+                self._by_room.setdefault(room_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription not in self._subscriptions:
+            return
+        self._subscriptions.discard(subscription)
+        self._all_rooms.discard(subscription)
+        for room_id in subscription.room_ids or ():
+            watchers = self._by_room.get(room_id)
+            if watchers is not None:
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._by_room[room_id]
+        self.dropped_closed += subscription.dropped
+
+    def publish(self, rows: list[dict]):
+        """Queue a batch of new rows for every interested client."""
+        self.rows += len(rows)
+        if not self._subscriptions:
+            return
+        settled_id = self.feed.settled_id if self.feed is not None else None
+        for row in rows:
+            watchers = self._by_room.get(row["room_id"])
+            if not watchers and not self._all_rooms:
+                continue
+            frame = encode_row(row, settled_id)  # encoded once, shared by all clients
+            for subscription in (*self._all_rooms, *(watchers or ())):
+                subscription.push(row["id"], frame)
+                self.frames += 1
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._subscriptions),
+            "max_queue": self.max_queue,
+            "rows": self.rows,
+            "frames": self.frames,
+            "queued": sum(s.queued for s in self._subscriptions),
+            "dropped": self.dropped_closed + sum(s.dropped for s in self._subscriptions),
+        }
@@ -0,0 +1,149 @@
+-- ComfortRoom Migration: partitioned sensor_data
+-- Converts a database created from an older schema.sql (sensor_data as one
+-- table with a SERIAL id) to the daily-partitioned layout with BIGINT ids.
+--
+-- Run once, while ingest is stopped:
+--   psql -d comfortroom_db -v ON_ERROR_STOP=1 -f migrate_sensor_data_partitions.sql
+--
+-- Everything happens in one transaction, so a failure leaves the old table
+-- untouched. Readings keep their ids; sensor_rollups already hold their
+-- aggregates, so the rollup trigger is only attached after the copy.
+-- Readings without a timestamp cannot be placed in a partition and are
+-- not copied.
+--
+-- Works on any earlier schema. The notify and rollup triggers are moved to
+-- the new table if their functions exist; databases that predate them are
+-- left without, as before (create them from schema.sql afterwards).
+
+BEGIN;
+
+LOCK TABLE sensor_data IN ACCESS EXCLUSIVE MODE;
+
+-- Move the old table and the names it owns out of the way
+ALTER TABLE sensor_data RENAME TO sensor_data_old;
+ALTER TABLE sensor_data_old RENAME CONSTRAINT sensor_data_pkey TO sensor_data_old_pkey;
+ALTER SEQUENCE sensor_data_id_seq RENAME TO sensor_data_old_id_seq;
+DROP INDEX IF EXISTS idx_sensor_data_room_time;
+DROP INDEX IF EXISTS idx_sensor_data_timestamp;
+DROP TRIGGER IF EXISTS sensor_data_notify ON sensor_data_old;
+DROP TRIGGER IF EXISTS sensor_data_rollup ON sensor_data_old;
+
+-- Same definitions as schema.sql
+CREATE TABLE sensor_data (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    room_id INTEGER REFERENCES rooms(id) ON DELETE CASCADE,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    temperature DECIMAL(4,1),
+    co2 INTEGER,
+    humidity DECIMAL(4,1),
+    sound DECIMAL(4,1),
+
+    CONSTRAINT valid_temperature CHECK (temperature BETWEEN -10 AND 50),
+    CONSTRAINT valid_co2 CHECK (co2 BETWEEN 300 AND 5000),
+    CONSTRAINT valid_humidity CHECK (humidity BETWEEN 0 AND 100),
+    CONSTRAINT valid_sound CHECK (sound BETWEEN 0 AND 130),
+
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE sensor_data_default PARTITION OF sensor_data DEFAULT;
+
+CREATE INDEX idx_sensor_data_room_time ON sensor_data(room_id, timestamp DESC, id DESC);
+CREATE INDEX idx_sensor_data_timestamp ON sensor_data(timestamp DESC);
+
+DO $$
+BEGIN
+    IF to_regclass('sensor_rollups') IS NOT NULL THEN
+        ALTER TABLE sensor_rollups ALTER COLUMN last_id TYPE BIGINT;
+    END IF;
+END;
+$$;
+
+CREATE FUNCTION create_sensor_data_partitions(
+    p_from DATE DEFAULT CURRENT_DATE,
+    p_days INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    day DATE;
+    part TEXT;
+    moved BIGINT;
+    created INTEGER := 0;
+BEGIN
+    FOR day IN SELECT generate_series(p_from, p_from + p_days, INTERVAL '1 day')::date LOOP
+        part := 'sensor_data_' || to_char(day, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+
+        -- Built standalone and attached, so stray rows can be moved in first
+        EXECUTE format('CREATE TABLE %I (LIKE sensor_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM sensor_data_default WHERE timestamp >= %L AND timestamp < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            day, day + 1, part);
+        GET DIAGNOSTICS moved = ROW_COUNT;
+        IF moved > 0 THEN
+            EXECUTE format('ANALYZE %I', part);
+        END IF;
+        EXECUTE format('ALTER TABLE sensor_data ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       part, day, day + 1);
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION drop_sensor_data_partitions(p_before DATE) RETURNS INTEGER AS $$
+DECLARE
+    part TEXT;
+    dropped INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'sensor_data'::regclass
+          AND c.relname ~ '^sensor_data_[0-9]{8}$'
+          AND to_date(right(c.relname, 8), 'YYYYMMDD') < p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('DROP TABLE %I', part);
+        dropped := dropped + 1;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One partition per day from the oldest reading until two days ahead
+SELECT create_sensor_data_partitions(
+    LEAST(MIN(timestamp)::date, CURRENT_DATE),
+    CURRENT_DATE + 2 - LEAST(MIN(timestamp)::date, CURRENT_DATE)
+)
+FROM sensor_data_old;
+
+INSERT INTO sensor_data (id, room_id, timestamp, temperature, co2, humidity, sound)
+SELECT id, room_id, timestamp, temperature, co2, humidity, sound
+FROM sensor_data_old
+WHERE timestamp IS NOT NULL;
+
+SELECT setval(pg_get_serial_sequence('sensor_data', 'id'), GREATEST(MAX(id), 1)) FROM sensor_data;
+
+DO $$
+BEGIN
+    IF to_regprocedure('notify_sensor_data()') IS NOT NULL THEN
+        CREATE TRIGGER sensor_data_notify
+            AFTER INSERT ON sensor_data
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_sensor_data();
+    END IF;
+    IF to_regprocedure('rollup_sensor_data()') IS NOT NULL THEN
+        CREATE TRIGGER sensor_data_rollup
+            AFTER INSERT ON sensor_data
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION rollup_sensor_data();
+    END IF;
+END;
+$$;
+
+DROP TABLE sensor_data_old;
+
+COMMIT;
+
+ANALYZE sensor_data;
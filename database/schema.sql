@@ -20,11 +20,13 @@ CREATE TABLE rooms (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Sensor Data: timestamped environmental readings per room
+-- Sensor Data: timestamped environmental readings per room, partitioned
+-- by day of timestamp (see PARTITIONS below). The primary key has to
+-- include the partition key; ids alone are still unique (identity).
 CREATE TABLE sensor_data (
-    id SERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
     room_id INTEGER REFERENCES rooms(id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     temperature DECIMAL(4,1),      -- Celsius (e.g., 22.5)
     co2 INTEGER,                   -- ppm (e.g., 650)
     humidity DECIMAL(4,1),         -- Percentage (e.g., 45.0)
@@ -34,8 +36,14 @@ CREATE TABLE sensor_data (
     CONSTRAINT valid_temperature CHECK (temperature BETWEEN -10 AND 50),
     CONSTRAINT valid_co2 CHECK (co2 BETWEEN 300 AND 5000),
     CONSTRAINT valid_humidity CHECK (humidity BETWEEN 0 AND 100),
-    CONSTRAINT valid_sound CHECK (sound BETWEEN 0 AND 130)
-);
+    CONSTRAINT valid_sound CHECK (sound BETWEEN 0 AND 130),
+
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catches readings for days without a partition (e.g. late backfills);
+-- create_sensor_data_partitions() moves them out again.
+CREATE TABLE sensor_data_default PARTITION OF sensor_data DEFAULT;
 
 -- Calendar Events: room bookings and schedules
 CREATE TABLE calendar_events (
@@ -50,11 +58,306 @@ CREATE TABLE calendar_events (
     CONSTRAINT valid_time_range CHECK (end_time > start_time)
 );
 
+-- Data Versions: change counters bumped by triggers, so API caches
+-- can tell whether their copy of a table is still current
+CREATE TABLE data_versions (
+    name VARCHAR(50) PRIMARY KEY,  -- table name
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (name) VALUES ('rooms'), ('calendar_events');
+
+-- Sensor Rollups: per room and minute/hour/day, maintained from sensor_data
+-- by the sensor_data_rollup trigger (see ROLLUPS below). The average of a
+-- criterion is <criterion>_sum / <criterion>_count; *_last are the values
+-- of the newest reading (last_timestamp, last_id) in the bucket.
+CREATE TABLE sensor_rollups (
+    resolution VARCHAR(10) NOT NULL,   -- 'minute', 'hour' or 'day'
+    room_id INTEGER NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    bucket TIMESTAMP NOT NULL,         -- start of the minute/hour/day
+    readings INTEGER NOT NULL,
+    last_id BIGINT NOT NULL,
+    last_timestamp TIMESTAMP NOT NULL,
+
+    temperature_count INTEGER NOT NULL,
+    temperature_sum DECIMAL NOT NULL,
+    temperature_min DECIMAL(4,1),
+    temperature_max DECIMAL(4,1),
+    temperature_last DECIMAL(4,1),
+
+    co2_count INTEGER NOT NULL,
+    co2_sum BIGINT NOT NULL,
+    co2_min INTEGER,
+    co2_max INTEGER,
+    co2_last INTEGER,
+
+    humidity_count INTEGER NOT NULL,
+    humidity_sum DECIMAL NOT NULL,
+    humidity_min DECIMAL(4,1),
+    humidity_max DECIMAL(4,1),
+    humidity_last DECIMAL(4,1),
+
+    sound_count INTEGER NOT NULL,
+    sound_sum DECIMAL NOT NULL,
+    sound_min DECIMAL(4,1),
+    sound_max DECIMAL(4,1),
+    sound_last DECIMAL(4,1),
+
+    PRIMARY KEY (resolution, room_id, bucket),
+    CONSTRAINT valid_resolution CHECK (resolution IN ('minute', 'hour', 'day'))
+);
+
 -----------------------------------------------------------
 -- INDEXES (for query performance)
 -----------------------------------------------------------
 
-CREATE INDEX idx_sensor_data_room_time ON sensor_data(room_id, timestamp DESC);
+-- The trailing ids make keyset pages (backend/pagination.py) one index seek
+CREATE INDEX idx_sensor_data_room_time ON sensor_data(room_id, timestamp DESC, id DESC);
 CREATE INDEX idx_sensor_data_timestamp ON sensor_data(timestamp DESC);
-CREATE INDEX idx_calendar_events_room ON calendar_events(room_id);
+CREATE INDEX idx_calendar_events_room ON calendar_events(room_id, start_time, id);
 CREATE INDEX idx_calendar_events_time ON calendar_events(start_time, end_time);
+
+-----------------------------------------------------------
+-- NOTIFICATIONS (for API caches)
+-----------------------------------------------------------
+
+-- Tell listening API processes that new sensor readings were written.
+-- Fires once per INSERT/COPY statement, not once per row.
+CREATE FUNCTION notify_sensor_data() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('sensor_data', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensor_data_notify
+    AFTER INSERT ON sensor_data
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_sensor_data();
+
+-- Bump the table's data_versions counter and tell listening API processes
+-- (channel 'data_versions', payload = table name).
+CREATE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+    PERFORM pg_notify('data_versions', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER rooms_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON rooms
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+CREATE TRIGGER calendar_events_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON calendar_events
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+-----------------------------------------------------------
+-- ROLLUPS (minute/hour/day aggregates of sensor_data)
+-----------------------------------------------------------
+
+-- Fold the rows of one INSERT/COPY statement into sensor_rollups.
+-- sensor_data is append-only; after updating or deleting readings, run
+-- rebuild_sensor_rollups() for the affected range.
+CREATE FUNCTION rollup_sensor_data() RETURNS trigger AS $$
+BEGIN
+    -- New readings are aggregated once into minutes; hours and days are
+    -- then folded from those minutes instead of from the readings again.
+    WITH minutes AS (
+        SELECT n.room_id, date_trunc('minute', n.timestamp) AS bucket, COUNT(*) AS readings,
+               (array_agg(n.id ORDER BY n.timestamp DESC, n.id DESC))[1] AS last_id,
+               MAX(n.timestamp) AS last_timestamp,
+               COUNT(n.temperature) AS temperature_count, COALESCE(SUM(n.temperature), 0) AS temperature_sum,
+               MIN(n.temperature) AS temperature_min, MAX(n.temperature) AS temperature_max,
+               (array_agg(n.temperature ORDER BY n.timestamp DESC, n.id DESC))[1] AS temperature_last,
+               COUNT(n.co2) AS co2_count, COALESCE(SUM(n.co2), 0) AS co2_sum,
+               MIN(n.co2) AS co2_min, MAX(n.co2) AS co2_max,
+               (array_agg(n.co2 ORDER BY n.timestamp DESC, n.id DESC))[1] AS co2_last,
+               COUNT(n.humidity) AS humidity_count, COALESCE(SUM(n.humidity), 0) AS humidity_sum,
+               MIN(n.humidity) AS humidity_min, MAX(n.humidity) AS humidity_max,
+               (array_agg(n.humidity ORDER BY n.timestamp DESC, n.id DESC))[1] AS humidity_last,
+               COUNT(n.sound) AS sound_count, COALESCE(SUM(n.sound), 0) AS sound_sum,
+               MIN(n.sound) AS sound_min, MAX(n.sound) AS sound_max,
+               (array_agg(n.sound ORDER BY n.timestamp DESC, n.id DESC))[1] AS sound_last
+        FROM new_rows n
+        WHERE n.room_id IS NOT NULL AND n.timestamp IS NOT NULL
+        GROUP BY n.room_id, date_trunc('minute', n.timestamp)
+    )
+    INSERT INTO sensor_rollups AS r (
+        resolution, room_id, bucket, readings, last_id, last_timestamp,
+        temperature_count, temperature_sum, temperature_min, temperature_max, temperature_last,
+        co2_count, co2_sum, co2_min, co2_max, co2_last,
+        humidity_count, humidity_sum, humidity_min, humidity_max, humidity_last,
+        sound_count, sound_sum, sound_min, sound_max, sound_last
+    )
+    SELECT 'minute', m.* FROM minutes m
+    UNION ALL
+    SELECT res.resolution, m.room_id, date_trunc(res.resolution, m.bucket), SUM(m.readings),
+           (array_agg(m.last_id ORDER BY m.last_timestamp DESC, m.last_id DESC))[1], MAX(m.last_timestamp),
+           SUM(m.temperature_count), SUM(m.temperature_sum), MIN(m.temperature_min), MAX(m.temperature_max),
+           (array_agg(m.temperature_last ORDER BY m.last_timestamp DESC, m.last_id DESC))[1],
+           SUM(m.co2_count), SUM(m.co2_sum), MIN(m.co2_min), MAX(m.co2_max),
+           (array_agg(m.co2_last ORDER BY m.last_timestamp DESC, m.last_id DESC))[1],
+           SUM(m.humidity_count), SUM(m.humidity_sum), MIN(m.humidity_min), MAX(m.humidity_max),
+           (array_agg(m.humidity_last ORDER BY m.last_timestamp DESC, m.last_id DESC))[1],
+           SUM(m.sound_count), SUM(m.sound_sum), MIN(m.sound_min), MAX(m.sound_max),
+           (array_agg(m.sound_last ORDER BY m.last_timestamp DESC, m.last_id DESC))[1]
+    FROM minutes m
+    CROSS JOIN (VALUES ('hour'), ('day')) AS res(resolution)
+    GROUP BY res.resolution, m.room_id, date_trunc(res.resolution, m.bucket)
+    -- Upsert in key order, so concurrent writers covering the same rooms
+    -- lock rollup rows in the same order instead of deadlocking
+    ORDER BY 1, 2, 3
+    ON CONFLICT (resolution, room_id, bucket) DO UPDATE SET
+        readings = r.readings + EXCLUDED.readings,
+        temperature_count = r.temperature_count + EXCLUDED.temperature_count,
+        temperature_sum = r.temperature_sum + EXCLUDED.temperature_sum,
+        temperature_min = LEAST(r.temperature_min, EXCLUDED.temperature_min),
+        temperature_max = GREATEST(r.temperature_max, EXCLUDED.temperature_max),
+        co2_count = r.co2_count + EXCLUDED.co2_count,
+        co2_sum = r.co2_sum + EXCLUDED.co2_sum,
+        co2_min = LEAST(r.co2_min, EXCLUDED.co2_min),
+        co2_max = GREATEST(r.co2_max, EXCLUDED.co2_max),
+        humidity_count = r.humidity_count + EXCLUDED.humidity_count,
+        humidity_sum = r.humidity_sum + EXCLUDED.humidity_sum,
+        humidity_min = LEAST(r.humidity_min, EXCLUDED.humidity_min),
+        humidity_max = GREATEST(r.humidity_max, EXCLUDED.humidity_max),
+        sound_count = r.sound_count + EXCLUDED.sound_count,
+        sound_sum = r.sound_sum + EXCLUDED.sound_sum,
+        sound_min = LEAST(r.sound_min, EXCLUDED.sound_min),
+        sound_max = GREATEST(r.sound_max, EXCLUDED.sound_max),
+        -- "last" values come from whichever side holds the newer reading
+        (last_id, last_timestamp, temperature_last, co2_last, humidity_last, sound_last) = (
+            SELECT * FROM (VALUES
+                (r.last_id, r.last_timestamp, r.temperature_last, r.co2_last, r.humidity_last, r.sound_last),
+                (EXCLUDED.last_id, EXCLUDED.last_timestamp, EXCLUDED.temperature_last,
+                 EXCLUDED.co2_last, EXCLUDED.humidity_last, EXCLUDED.sound_last)
+            ) AS v(last_id, last_timestamp, temperature_last, co2_last, humidity_last, sound_last)
+            ORDER BY last_timestamp DESC, last_id DESC
+            LIMIT 1
+        );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensor_data_rollup
+    AFTER INSERT ON sensor_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_sensor_data();
+
+-- Recompute the rollups of whole days from sensor_data. Idempotent; NULL
+-- arguments mean all rooms / from the first / until the last reading.
+-- Blocks rollup maintenance by concurrent inserts until the transaction ends.
+CREATE FUNCTION rebuild_sensor_rollups(
+    p_room_id INTEGER DEFAULT NULL,
+    p_from TIMESTAMP DEFAULT NULL,
+    p_to TIMESTAMP DEFAULT NULL
+) RETURNS BIGINT AS $$
+DECLARE
+    lo TIMESTAMP := date_trunc('day', p_from);
+    hi TIMESTAMP := date_trunc('day', p_to) + INTERVAL '1 day';
+    written BIGINT;
+BEGIN
+    LOCK TABLE sensor_rollups IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM sensor_rollups
+    WHERE (p_room_id IS NULL OR room_id = p_room_id)
+      AND (lo IS NULL OR bucket >= lo)
+      AND (hi IS NULL OR bucket < hi);
+
+    INSERT INTO sensor_rollups (
+        resolution, room_id, bucket, readings, last_id, last_timestamp,
+        temperature_count, temperature_sum, temperature_min, temperature_max, temperature_last,
+        co2_count, co2_sum, co2_min, co2_max, co2_last,
+        humidity_count, humidity_sum, humidity_min, humidity_max, humidity_last,
+        sound_count, sound_sum, sound_min, sound_max, sound_last
+    )
+    SELECT res.resolution, s.room_id, date_trunc(res.resolution, s.timestamp), COUNT(*),
+           (array_agg(s.id ORDER BY s.timestamp DESC, s.id DESC))[1], MAX(s.timestamp),
+           COUNT(s.temperature), COALESCE(SUM(s.temperature), 0), MIN(s.temperature), MAX(s.temperature),
+           (array_agg(s.temperature ORDER BY s.timestamp DESC, s.id DESC))[1],
+           COUNT(s.co2), COALESCE(SUM(s.co2), 0), MIN(s.co2), MAX(s.co2),
+           (array_agg(s.co2 ORDER BY s.timestamp DESC, s.id DESC))[1],
+           COUNT(s.humidity), COALESCE(SUM(s.humidity), 0), MIN(s.humidity), MAX(s.humidity),
+           (array_agg(s.humidity ORDER BY s.timestamp DESC, s.id DESC))[1],
+           COUNT(s.sound), COALESCE(SUM(s.sound), 0), MIN(s.sound), MAX(s.sound),
+           (array_agg(s.sound ORDER BY s.timestamp DESC, s.id DESC))[1]
+    FROM sensor_data s
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS res(resolution)
+    WHERE s.room_id IS NOT NULL AND s.timestamp IS NOT NULL
+      AND (p_room_id IS NULL OR s.room_id = p_room_id)
+      AND (lo IS NULL OR s.timestamp >= lo)
+      AND (hi IS NULL OR s.timestamp < hi)
+    GROUP BY res.resolution, s.room_id, date_trunc(res.resolution, s.timestamp);
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+-----------------------------------------------------------
+-- PARTITIONS (one sensor_data partition per day)
+-----------------------------------------------------------
+
+-- Create the daily partitions sensor_data_YYYYMMDD for p_from and the
+-- p_days days after it; existing ones are skipped. Readings for those days
+-- that landed in sensor_data_default are moved into the new partition.
+-- The API calls this on startup and periodically (backend/partitions.py).
+-- Returns the number of partitions created.
+CREATE FUNCTION create_sensor_data_partitions(
+    p_from DATE DEFAULT CURRENT_DATE,
+    p_days INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    day DATE;
+    part TEXT;
+    moved BIGINT;
+    created INTEGER := 0;
+BEGIN
+    FOR day IN SELECT generate_series(p_from, p_from + p_days, INTERVAL '1 day')::date LOOP
+        part := 'sensor_data_' || to_char(day, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+
+        -- Built standalone and attached, so stray rows can be moved in first
+        EXECUTE format('CREATE TABLE %I (LIKE sensor_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM sensor_data_default WHERE timestamp >= %L AND timestamp < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            day, day + 1, part);
+        GET DIAGNOSTICS moved = ROW_COUNT;
+        IF moved > 0 THEN
+            EXECUTE format('ANALYZE %I', part);
+        END IF;
+        EXECUTE format('ALTER TABLE sensor_data ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       part, day, day + 1);
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop the daily partitions of days before p_before. Far cheaper than
+-- deleting the readings; sensor_rollups keep their aggregates.
+-- Returns the number of partitions dropped.
+CREATE FUNCTION drop_sensor_data_partitions(p_before DATE) RETURNS INTEGER AS $$
+DECLARE
+    part TEXT;
+    dropped INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'sensor_data'::regclass
+          AND c.relname ~ '^sensor_data_[0-9]{8}$'
+          AND to_date(right(c.relname, 8), 'YYYYMMDD') < p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('DROP TABLE %I', part);
+        dropped := dropped + 1;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_sensor_data_partitions();
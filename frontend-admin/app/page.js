@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useMemo, useEffect } from 'react';
+import { useState, useMemo, useEffect, useRef } from 'react';
 import {
   Container,
   Typography,
@@ -37,6 +37,53 @@ import {
 } from 'recharts';
 import { format, subDays, addHours, parseISO } from 'date-fns';
 
+// Points per chart for the history load (downsampled by the API), and the
+// live readings shown next to it before the history is reloaded to bucket them
+const CHART_POINTS = 300;
+const MAX_LIVE_POINTS = 1000;
+
+// Delay before reloading the history after the stream reported dropped
+// readings; doubles while drops keep coming, and is reset once the stream
+// has run this long without one
+const DROPPED_RELOAD_DELAY = 2000;
+const DROPPED_RELOAD_MAX_DELAY = 60000;
+const DROPPED_RELOAD_RESET = 60000;
+
+// Map an API sensor row to chart format (id 0 marks a gap without readings)
+function toChartPoint(d) {
+  return {
+    id: d.id,
+    timestamp: d.timestamp,
+    time: format(parseISO(d.timestamp), 'MM/dd HH:mm'),
+    temperature: d.temperature,
+    co2: d.co2,
+    humidity: d.humidity,
+    sound: d.sound,
+    disconnected: d.id === 0,
+    ms: parseISO(d.timestamp).getTime(),
+  };
+}
+
+// Insert a point into time-ordered points, unless its reading is there already
+function insertPoint(points, point) {
+  if (points.some((p) => p.id === point.id)) return points;
+  let index = points.length;
+  while (index > 0 && points[index - 1].ms > point.ms) index--;
+  return [...points.slice(0, index), point, ...points.slice(index)];
+}
+
+// Merge two time-ordered point lists
+function mergeByTime(a, b) {
+  const merged = [];
+  let i = 0;
+  let j = 0;
+  while (i < a.length || j < b.length) {
+    if (j >= b.length || (i < a.length && a[i].ms <= b[j].ms)) merged.push(a[i++]);
+    else merged.push(b[j++]);
+  }
+  return merged;
+}
+
 // Chart component with disconnection highlighting
 function SensorChart({ data, dataKey, label, unit, color, optimalRange }) {
   return (
@@ -91,8 +138,11 @@ export default function AdminDashboard() {
   const [selectedRoom, setSelectedRoom] = useState(null);
   const [startDate, setStartDate] = useState(format(subDays(new Date(), 7), 'yyyy-MM-dd'));
   const [endDate, setEndDate] = useState(format(new Date(), 'yyyy-MM-dd'));
-  const [sensorData, setSensorData] = useState([]);
+  const [historyData, setHistoryData] = useState([]);
+  const [liveData, setLiveData] = useState([]);
   const [calendarEvents, setCalendarEvents] = useState([]);
+  const [historyVersion, setHistoryVersion] = useState(0);
+  const reloadDelay = useRef(DROPPED_RELOAD_DELAY);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -118,40 +168,103 @@ export default function AdminDashboard() {
     fetchRooms();
   }, []);
 
-  // Fetch sensor data when room or date range changes
+  // Load the sensor history when room or date range changes, and follow
+  // new readings over the live stream if the range includes today
   useEffect(() => {
     if (!selectedRoom) return;
 
+    let cancelled = false;
+    let source = null;
+    let reloadTimer = null;
+    let resetTimer = null;
+    let historyIds = null;  // ids in the loaded history; null while loading
+    let pending = [];       // readings that arrived while it was loading
+    let liveCount = 0;
+    const chartStart = new Date(startDate);
+
     const fetchSensorData = async () => {
       try {
-        const startISO = new Date(startDate).toISOString();
-        const endISO = new Date(endDate + 'T23:59:59').toISOString();
-        const url = `http://localhost:8000/api/sensors/${selectedRoom}?start=${startISO}&end=${endISO}&limit=1000`;
+        const startISO = chartStart.toISOString();
+        // Stop at now, otherwise the future part of today shows up as gaps
+        const endISO = new Date(Math.min(Date.now(), new Date(endDate + 'T23:59:59'))).toISOString();
+        const url = `http://localhost:8000/api/sensors/${selectedRoom}?start=${startISO}&end=${endISO}&points=${CHART_POINTS}`;
 
         const response = await fetch(url);
         if (!response.ok) throw new Error('Failed to fetch sensor data');
         const data = await response.json();
+        if (cancelled) return;
 
-        // Map to chart format
-        const mappedData = data.reverse().map((d) => ({
-          timestamp: d.timestamp,
-          time: format(parseISO(d.timestamp), 'MM/dd HH:mm'),
-          temperature: d.temperature,
-          co2: d.co2,
-          humidity: d.humidity,
-          sound: d.sound,
-          disconnected: false,
-        }));
-
-        setSensorData(mappedData);
+        const points = data.reverse().map(toChartPoint);
+        historyIds = new Set(points.map((point) => point.id));
+        setHistoryData(points);
+        setLiveData(pending.filter((point) => !historyIds.has(point.id)).reduce(insertPoint, []));
+        liveCount = pending.length;
+        pending = null;
       } catch (err) {
         console.error('Failed to fetch sensor data:', err);
-        setSensorData([]);
+        if (cancelled) return;
+        setHistoryData([]);
+        setLiveData([]);
+        if (source) source.close();
       }
     };
 
-    fetchSensorData();
-  }, [selectedRoom, startDate, endDate]);
+    const reload = (delay) => {
+      if (reloadTimer !== null) return;
+      source.close();
+      clearTimeout(resetTimer);
+      reloadTimer = setTimeout(() => setHistoryVersion((version) => version + 1), delay);
+    };
+
+    if (endDate < format(new Date(), 'yyyy-MM-dd')) {
+      fetchSensorData();
+    } else {
+      // Subscribe first and load the history once the stream is open, so
+      // every reading is in one or the other (or both: skipped by id)
+      let started = false;
+      source = new EventSource(`http://localhost:8000/api/stream/sensors?room_id=${selectedRoom}`);
+      source.addEventListener('open', () => {
+        clearTimeout(resetTimer);
+        resetTimer = setTimeout(() => {
+          reloadDelay.current = DROPPED_RELOAD_DELAY;
+        }, DROPPED_RELOAD_RESET);
+        if (!started) {
+          started = true;
+          fetchSensorData();
+        }
+      });
+      // Readings come in commit order; a late commit can be older than
+      // readings already shown, so points are inserted by timestamp
+      source.addEventListener('reading', (event) => {
+        const point = toChartPoint(JSON.parse(event.data));
+        if (point.ms < chartStart.getTime()) return;
+        if (pending !== null) {
+          pending.push(point);
+          return;
+        }
+        if (historyIds.has(point.id)) return;
+        setLiveData((current) => insertPoint(current, point));
+        // Bucket a long live tail into the chart like the rest of the history
+        liveCount += 1;
+        if (liveCount > MAX_LIVE_POINTS) reload(0);
+      });
+      // The server skipped readings because this tab fell behind: reload
+      // the history, backing off while that keeps happening
+      source.addEventListener('dropped', () => {
+        if (reloadTimer !== null) return;
+        const delay = reloadDelay.current;
+        reloadDelay.current = Math.min(delay * 2, DROPPED_RELOAD_MAX_DELAY);
+        reload(delay);
+      });
+    }
+
+    return () => {
+      cancelled = true;
+      clearTimeout(reloadTimer);
+      clearTimeout(resetTimer);
+      if (source) source.close();
+    };
+  }, [selectedRoom, startDate, endDate, historyVersion]);
 
   // Fetch calendar events when room changes
   useEffect(() => {
@@ -182,6 +295,9 @@ export default function AdminDashboard() {
     fetchCalendarEvents();
   }, [selectedRoom]);
 
+  // The loaded history with the live readings since
+  const sensorData = useMemo(() => mergeByTime(historyData, liveData), [historyData, liveData]);
+
   // Get current room data
   const currentRoom = rooms.find(r => r.id === selectedRoom);
 